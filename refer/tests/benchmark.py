@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+
+import testUtils
+
+import argparse
+import json
+import math
+import random
+import statistics
+import time
+
+from core_symbol import CORE_SYMBOL
+
+###############################################################
+# benchmark
+#
+# Times core harness operations against a launched cluster, many iterations each, and optionally stores the samples
+# as a JSON baseline (--save) or compares them against one (--baseline). An operation regresses when its median is
+# more than --threshold slower than the baseline median and a one sided Mann-Whitney U test says the slowdown is
+# significant at --alpha. Operations measured once (bootstrap phases) are judged on the threshold alone.
+#
+###############################################################
+
+Print=testUtils.Utils.Print
+
+def errorExit(msg="", errorCode=1):
+    Print("ERROR:", msg)
+    exit(errorCode)
+
+class Benchmark(object):
+    Version=1
+
+    def __init__(self):
+        self.results={} # operation name -> list of seconds
+
+    def measure(self, name, fn, iterations):
+        """Call fn(i) iterations times recording each call's duration. fn returning False counts as failure."""
+        samples=[]
+        for i in range(iterations):
+            start=time.perf_counter()
+            ret=fn(i)
+            duration=time.perf_counter() - start
+            if ret is False or ret is None:
+                errorExit("%s failed on iteration %d" % (name, i))
+            samples.append(duration)
+        self.results[name]=samples
+        Print("%-28s %s" % (name, Benchmark.summary(samples)))
+        return samples
+
+    def record(self, name, seconds):
+        self.results[name]=[seconds]
+
+    @staticmethod
+    def summary(samples):
+        ordered=sorted(samples)
+        return "n %4d  median %9.3fms  mean %9.3fms  p90 %9.3fms  min %9.3fms" % (
+            len(samples), statistics.median(samples)*1000, statistics.mean(samples)*1000,
+            ordered[min(len(ordered)-1, int(len(ordered)*0.9))]*1000, ordered[0]*1000)
+
+    def toJson(self, metadata):
+        return {"version": Benchmark.Version, "metadata": metadata,
+                "results": {name: [round(sample, 7) for sample in samples] for name,samples in self.results.items()}}
+
+    @staticmethod
+    def mannWhitneyP(baseline, current):
+        """One sided p value (normal approximation with tie correction) that current tends to be larger than baseline."""
+        n1=len(baseline)
+        n2=len(current)
+        combined=sorted([(value, 0) for value in baseline] + [(value, 1) for value in current])
+        ranks=[0.0]*len(combined)
+        tieTerm=0.0
+        i=0
+        while i < len(combined):
+            j=i
+            while j+1 < len(combined) and combined[j+1][0] == combined[i][0]:
+                j += 1
+            for k in range(i, j+1):
+                ranks[k]=(i + j)/2.0 + 1
+            ties=j - i + 1
+            tieTerm += ties**3 - ties
+            i=j+1
+        rankSum=sum(rank for rank,(_, group) in zip(ranks, combined) if group == 1)
+        u=rankSum - n2*(n2+1)/2.0
+        mean=n1*n2/2.0
+        n=n1+n2
+        variance=n1*n2/12.0*((n+1) - tieTerm/(n*(n-1)))
+        if variance <= 0:
+            return 1.0
+        z=(u - mean - 0.5)/math.sqrt(variance)
+        return 0.5*math.erfc(z/math.sqrt(2))
+
+    @staticmethod
+    def compare(baseline, current, threshold, alpha):
+        """Returns list of (name, baseline median, current median, ratio, p value or None, regressed) for operations in
+        both result sets."""
+        rows=[]
+        for name in sorted(current):
+            if name not in baseline:
+                continue
+            old=baseline[name]
+            new=current[name]
+            oldMedian=statistics.median(old)
+            newMedian=statistics.median(new)
+            ratio=newMedian/oldMedian if oldMedian > 0 else float("inf")
+            p=None
+            regressed=ratio > 1 + threshold
+            if len(old) > 1 and len(new) > 1:
+                p=Benchmark.mannWhitneyP(old, new)
+                regressed=regressed and p < alpha
+            rows.append((name, oldMedian, newMedian, ratio, p, regressed))
+        return rows
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-p", type=int, help="producing nodes count", default=1)
+parser.add_argument("-n", type=int, help="total nodes", default=0)
+parser.add_argument("-d", type=int, help="delay between nodes startup", default=1)
+parser.add_argument("-s", type=str, help="topology", default="mesh")
+parser.add_argument("-v", help="verbose", action='store_true')
+parser.add_argument("--iterations", type=int, help="iterations per operation", default=50)
+parser.add_argument("--save", type=str, help="write results as a JSON baseline to this file")
+parser.add_argument("--baseline", type=str, help="compare results against this JSON baseline")
+parser.add_argument("--threshold", type=float, help="median slowdown (fraction) tolerated before flagging", default=0.2)
+parser.add_argument("--alpha", type=float, help="significance level of the slowdown test", default=0.01)
+parser.add_argument("--seed", type=int, help="random seed", default=1)
+parser.add_argument("--dont-kill", help="Leave cluster running after test finishes", action='store_true')
+parser.add_argument("--dump-error-details",
+                    help="Upon error print etc/io/node_*/config.ini and var/lib/node_*/stderr.log to stdout",
+                    action='store_true')
+
+args = parser.parse_args()
+pnodes=args.p
+topo=args.s
+delay=args.d
+total_nodes = pnodes if args.n == 0 else args.n
+iterations=args.iterations
+dontKill=args.dont_kill
+dumpErrorDetails=args.dump_error_details
+
+testUtils.Utils.Debug=args.v
+random.seed(args.seed)
+
+baseline=None
+if args.baseline is not None:
+    with open(args.baseline, "r") as f:
+        baseline=json.load(f)
+    if baseline.get("version") != Benchmark.Version:
+        errorExit("Baseline %s has unsupported version %s" % (args.baseline, baseline.get("version")))
+
+cluster=testUtils.Cluster(walletd=True)
+walletMgr=testUtils.WalletMgr(True)
+testSuccessful=False
+regressions=[]
+
+try:
+    cluster.setWalletMgr(walletMgr)
+    cluster.killall()
+    cluster.cleanup()
+    walletMgr.killall()
+    walletMgr.cleanup()
+
+    benchmark=Benchmark()
+
+    Print("Stand up cluster")
+    start=time.perf_counter()
+    if cluster.launch(pnodes, total_nodes, topo=topo, delay=delay) is False:
+        errorExit("Failed to stand up cluster.")
+    benchmark.record("cluster launch", time.perf_counter() - start)
+    for phase,seconds in testUtils.Cluster.bootstrapTimings:
+        benchmark.record("bootstrap: %s" % (phase), seconds)
+
+    if not cluster.waitOnClusterBlockNumSync(3):
+        errorExit("Cluster never stabilized")
+
+    Print("Stand up wallet kd")
+    walletMgr.killall()
+    walletMgr.cleanup()
+    if walletMgr.launch() is False:
+        errorExit("Failed to stand up kd.")
+    wallet=walletMgr.create("benchmark")
+    if wallet is None:
+        errorExit("Failed to create wallet.")
+    if not cluster.populateWallet(2, wallet):
+        errorExit("Wallet initialization failed.")
+    if not cluster.createAccounts(cluster.ioAccount):
+        errorExit("Accounts creation failed.")
+
+    node=cluster.getNode(0)
+    source=cluster.defproduceraAccount
+    destination=cluster.accounts[0]
+    headBlockNum=node.getHeadBlockNum()
+
+    Print("Benchmark %d iterations per operation" % (iterations))
+    benchmark.measure("getInfo", lambda i: node.getInfo(), iterations)
+    benchmark.measure("getBlock", lambda i: node.getBlock(str(random.randint(1, headBlockNum))), iterations)
+
+    transIds=[]
+    amountStr="0.0001 %s" % (CORE_SYMBOL)
+    def transfer(i):
+        trans=node.transferFunds(source, destination, amountStr, "benchmark %d" % (i))
+        if trans is not None:
+            transIds.append(node.getTransId(trans))
+        return trans
+    benchmark.measure("transferFunds", transfer, iterations)
+    if not node.waitForTransIdOnNode(transIds[-1]):
+        errorExit("Last benchmark transfer never got into a block")
+    benchmark.measure("getTransaction", lambda i: node.getTransaction(transIds[i]), iterations)
+    # misses, the common case when scanning blocks for a transaction. Blocks up to headBlockNum predate the transfers.
+    benchmark.measure("isTransInBlock",
+                      lambda i: not node.isTransInBlock(transIds[i], str(max(1, headBlockNum - i % 10))), iterations)
+
+    newAccounts=testUtils.Cluster.createAccountKeys(iterations)
+    if newAccounts is None:
+        errorExit("Failed to create account keys.")
+    benchmark.measure("createAccount", lambda i: node.createAccount(newAccounts[i], cluster.ioAccount, 0), iterations)
+
+    balanceAccounts=[source, destination] + cluster.accounts[1:]
+    benchmark.measure("getBalances", lambda i: node.getBalances(balanceAccounts), iterations)
+    balanceNames=[account.name for account in balanceAccounts]
+    benchmark.measure("getBalanceSnapshot", lambda i: node.getBalanceSnapshot(balanceNames), iterations)
+
+    metadata={"time": time.time(), "pnodes": pnodes, "total_nodes": total_nodes, "topology": topo,
+              "iterations": iterations, "http": testUtils.Utils.UseHttp, "json": testUtils.JsonDecoder.Name}
+    report=benchmark.toJson(metadata)
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=1)
+        Print("Benchmark results written to %s" % (args.save))
+
+    if baseline is not None:
+        Print("Comparison with baseline %s (threshold %.0f%%, alpha %g)" % (args.baseline, args.threshold*100, args.alpha))
+        for name,oldMedian,newMedian,ratio,p,regressed in Benchmark.compare(
+                baseline["results"], report["results"], args.threshold, args.alpha):
+            Print("%-28s %9.3fms -> %9.3fms  x%.2f  p %s%s" % (name, oldMedian*1000, newMedian*1000, ratio,
+                  "n/a" if p is None else "%.4f" % (p), "  REGRESSION" if regressed else ""))
+            if regressed:
+                regressions.append(name)
+
+    testSuccessful=True
+finally:
+    if not testSuccessful and dumpErrorDetails:
+        cluster.dumpErrorDetails()
+        Print("== Errors see above ==")
+
+    if not dontKill:
+        Print("Shut down the cluster and cleanup.")
+        cluster.killall()
+        cluster.cleanup()
+        Print("Shut down the wallet and cleanup.")
+        walletMgr.killall()
+        walletMgr.cleanup()
+
+if len(regressions) > 0:
+    errorExit("%d operation(s) regressed: %s" % (len(regressions), ", ".join(regressions)))
+
+exit(0)
@@ -0,0 +1,142 @@
+import json
+import mmap
+import os
+import struct
+import threading
+
+# Local append-only store of fetched blocks, so analysis can revisit blocks without querying the nodes again. Blocks
+# are appended as compact json to <dir>/blocks.log. <dir>/blocks.index holds one fixed-width entry per block number
+# (log offset, length, raw block id) at (block number - 1) * EntrySize, so lookups by number are a single seek. Block
+# ids start with their block number, so lookups by id are too. Both files are memory-mapped for reads.
+
+class BlockArchive(object):
+    """Append-only block archive in directory path. Storing a block already archived under the same id is a no-op.
+    Storing a block number again with a different id (e.g. after a fork switch) appends the new block and points the
+    index at it, the log keeps the old one."""
+
+    LogName="blocks.log"
+    IndexName="blocks.index"
+    Entry=struct.Struct("<QI32s") # offset, length (0 = absent), block id
+    EntrySize=Entry.size
+
+    def __init__(self, path):
+        self.path=path
+        os.makedirs(path, exist_ok=True)
+        self.__logFd=os.open(os.path.join(path, BlockArchive.LogName), os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        self.__indexFd=os.open(os.path.join(path, BlockArchive.IndexName), os.O_RDWR | os.O_CREAT, 0o644)
+        self.__logMap=None
+        self.__indexMap=None
+        self.__lock=threading.Lock()
+
+    def close(self):
+        with self.__lock:
+            for m in (self.__logMap, self.__indexMap):
+                if m is not None:
+                    m.close()
+            self.__logMap=self.__indexMap=None
+            if self.__logFd is not None:
+                os.close(self.__logFd)
+                os.close(self.__indexFd)
+                self.__logFd=self.__indexFd=None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @staticmethod
+    def blockNumFromId(blockId):
+        """Block ids carry the block number in their first 4 bytes."""
+        return int(blockId[:8], 16)
+
+    @staticmethod
+    def __blockId(block):
+        return block.get("id", block.get("block_id"))
+
+    def __remap(self, name, fd, size):
+        # maps grow with their files, re-mapped whenever a read reaches past the mapped size
+        m=getattr(self, name)
+        if m is not None and len(m) >= size:
+            return m
+        if m is not None:
+            m.close()
+        fileSize=os.fstat(fd).st_size
+        m=mmap.mmap(fd, fileSize, access=mmap.ACCESS_READ) if fileSize > 0 else None
+        setattr(self, name, m)
+        return m
+
+    def put(self, block):
+        """Append block json object (from get block), unless it is already archived. Returns its block number."""
+        blockNum=int(block["block_num"])
+        assert(blockNum > 0)
+        blockId=BlockArchive.__blockId(block)
+        rawId=bytes.fromhex(blockId) if blockId else b""
+        with self.__lock:
+            entry=self.__entry(blockNum)
+            if blockId and entry is not None and entry[2] == blockId.lower():
+                return blockNum
+            data=json.dumps(block, separators=(",", ":")).encode("utf-8")
+            offset=os.lseek(self.__logFd, 0, os.SEEK_END)
+            os.write(self.__logFd, data)
+            os.pwrite(self.__indexFd, BlockArchive.Entry.pack(offset, len(data), rawId), (blockNum-1)*BlockArchive.EntrySize)
+        return blockNum
+
+    def __entry(self, blockNum):
+        """Returns (offset, length, block id) or None. Called with the lock held."""
+        if blockNum < 1:
+            return None
+        end=blockNum*BlockArchive.EntrySize
+        indexMap=self.__remap("_BlockArchive__indexMap", self.__indexFd, end)
+        if indexMap is None or len(indexMap) < end:
+            return None
+        offset,length,rawId=BlockArchive.Entry.unpack_from(indexMap, end - BlockArchive.EntrySize)
+        if length == 0:
+            return None
+        return (offset, length, rawId.hex() if rawId != bytes(32) else None)
+
+    def has(self, blockNum):
+        with self.__lock:
+            return self.__entry(blockNum) is not None
+
+    def getBlockId(self, blockNum):
+        with self.__lock:
+            entry=self.__entry(blockNum)
+            return None if entry is None else entry[2]
+
+    def getRaw(self, blockNum):
+        """Returns the stored json bytes of block blockNum, None if not archived."""
+        with self.__lock:
+            entry=self.__entry(blockNum)
+            if entry is None:
+                return None
+            offset,length,_=entry
+            logMap=self.__remap("_BlockArchive__logMap", self.__logFd, offset + length)
+            return bytes(logMap[offset:offset + length])
+
+    def get(self, blockNum):
+        """Returns block json object, None if not archived."""
+        data=self.getRaw(blockNum)
+        return None if data is None else json.loads(data)
+
+    def getById(self, blockId):
+        """Returns block json object, None if no block with this id is archived."""
+        blockNum=BlockArchive.blockNumFromId(blockId)
+        if self.getBlockId(blockNum) != blockId.lower():
+            return None
+        return self.get(blockNum)
+
+    def highBlockNum(self):
+        """Highest block number the index has room for (blocks below may be absent)."""
+        return os.fstat(self.__indexFd).st_size // BlockArchive.EntrySize
+
+    def blockNums(self):
+        """Returns list of archived block numbers."""
+        return [blockNum for blockNum in range(1, self.highBlockNum()+1) if self.has(blockNum)]
+
+    def iterBlocks(self, start=1, end=None):
+        """Generator of (block number, block json object or None) like Node.iterBlocks, read from the archive."""
+        if end is None:
+            end=self.highBlockNum()
+        for blockNum in range(start, end+1):
+            yield (blockNum, self.get(blockNum))
@@ -0,0 +1,91 @@
+import json
+import re
+
+# Bytes-first decoding of nod/cl/mongo json responses. Responses are parsed straight from the bytes they arrived in
+# (no utf-8 decode to str and no re-slicing of copies), with orjson or ujson when installed and the json module
+# otherwise. project() trims decoded objects down to the fields a caller keeps, so large blocks are not held on to.
+
+try:
+    import orjson
+except ImportError:
+    orjson=None
+
+try:
+    import ujson
+except ImportError:
+    ujson=None
+
+class JsonDecoder(object):
+    if orjson is not None:
+        Name="orjson"
+    elif ujson is not None:
+        Name="ujson"
+    else:
+        Name="json"
+
+    # mongo shell extended json, e.g. ObjectId("5ae...") -> "ObjectId-5ae..."
+    __mongoPattern=re.compile(rb'(ObjectId|ISODate)\("([^"]*)"\)')
+
+    @staticmethod
+    def loads(data):
+        """Decode json bytes (bytes, bytearray, memoryview or str)."""
+        if orjson is not None:
+            return orjson.loads(data)
+        if isinstance(data, memoryview):
+            data=data.tobytes()
+        if ujson is not None:
+            return ujson.loads(data)
+        return json.loads(data)
+
+    @staticmethod
+    def embedded(data):
+        """Returns memoryview of the outermost json object in data (bytes), which may be surrounded by other output
+        such as cl warnings. Empty if there is none."""
+        firstIdx=data.find(b"{")
+        lastIdx=data.rfind(b"}")
+        if firstIdx < 0 or lastIdx < firstIdx:
+            return memoryview(b"")
+        return memoryview(data)[firstIdx:lastIdx+1]
+
+    @staticmethod
+    def normalizeMongo(data):
+        """Rewrite mongo shell extended json (bytes or memoryview, as from embedded()) into plain json in one pass."""
+        if isinstance(data, memoryview):
+            data=data.tobytes()
+        return JsonDecoder.__mongoPattern.sub(rb'"\1-\2"', data)
+
+    @staticmethod
+    def project(obj, paths):
+        """Returns obj reduced to paths, each a list of keys from the root where "*" selects every list element, e.g.
+        ["transactions", "*", "trx", "id"]. Keys missing from obj are skipped; list elements lacking the rest of the
+        path are kept as empty objects so lists stay aligned."""
+        missing=object()
+        def keep(value, path):
+            if len(path) == 0:
+                return value
+            key=path[0]
+            if key == "*":
+                if not isinstance(value, list):
+                    return missing
+                items=[keep(item, path[1:]) for item in value]
+                return [{} if item is missing else item for item in items]
+            if not isinstance(value, dict) or key not in value:
+                return missing
+            inner=keep(value[key], path[1:])
+            return missing if inner is missing else {key: inner}
+
+        def merge(into, value):
+            if isinstance(into, dict) and isinstance(value, dict):
+                for key,item in value.items():
+                    into[key]=merge(into[key], item) if key in into else item
+                return into
+            if isinstance(into, list) and isinstance(value, list):
+                return [merge(a, b) for a,b in zip(into, value)]
+            return value
+
+        result={}
+        for path in paths:
+            value=keep(obj, path)
+            if value is not missing:
+                result=merge(result, value)
+        return result
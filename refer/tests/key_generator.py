@@ -0,0 +1,173 @@
+import hashlib
+import os
+import concurrent.futures
+
+# In-process secp256k1 key pair generation producing the same WIF private key and base58 public key strings as
+# "cl create key", so large account sets can be provisioned without forking cl twice per account.
+
+class KeyGenerator:
+    # public key string prefix (this chain emits bare base58 public keys)
+    PublicKeyPrefix=""
+
+    P=0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
+    N=0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+    G=(0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+       0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8)
+
+    Base58Alphabet="123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+    # fixed base window table: __table[i][j] == j * 16^i * G (affine, None for infinity)
+    __table=None
+
+    @staticmethod
+    def b58encode(data):
+        num=int.from_bytes(data, "big")
+        out=""
+        while num > 0:
+            num,rem=divmod(num, 58)
+            out=KeyGenerator.Base58Alphabet[rem] + out
+        pad=len(data) - len(data.lstrip(b"\0"))
+        return KeyGenerator.Base58Alphabet[0]*pad + out
+
+    @staticmethod
+    def b58decode(s):
+        num=0
+        for c in s:
+            num=num*58 + KeyGenerator.Base58Alphabet.index(c)
+        data=num.to_bytes((num.bit_length()+7)//8, "big")
+        pad=len(s) - len(s.lstrip(KeyGenerator.Base58Alphabet[0]))
+        return b"\0"*pad + data
+
+    @staticmethod
+    def __affineAdd(p1, p2):
+        P=KeyGenerator.P
+        if p1 is None:
+            return p2
+        if p2 is None:
+            return p1
+        if p1[0] == p2[0]:
+            if (p1[1] + p2[1]) % P == 0:
+                return None
+            lam=(3*p1[0]*p1[0]) * pow(2*p1[1], -1, P) % P
+        else:
+            lam=(p2[1] - p1[1]) * pow(p2[0] - p1[0], -1, P) % P
+        x=(lam*lam - p1[0] - p2[0]) % P
+        return (x, (lam*(p1[0] - x) - p1[1]) % P)
+
+    @staticmethod
+    def __buildTable():
+        table=[]
+        base=KeyGenerator.G
+        for _ in range(64):
+            row=[None]
+            for _ in range(15):
+                row.append(KeyGenerator.__affineAdd(row[-1], base))
+            table.append(row)
+            base=KeyGenerator.__affineAdd(row[15], base) # 16 * base
+        KeyGenerator.__table=table
+
+    @staticmethod
+    def __jacobianAddAffine(x1, y1, z1, x2, y2):
+        """Mixed addition of Jacobian point (x1, y1, z1) and affine point (x2, y2). Returns Jacobian point."""
+        P=KeyGenerator.P
+        if z1 == 0:
+            return (x2, y2, 1)
+        z1z1=z1*z1 % P
+        u2=x2*z1z1 % P
+        s2=y2*z1*z1z1 % P
+        h=(u2 - x1) % P
+        r=(s2 - y1) % P
+        if h == 0:
+            if r != 0:
+                return (0, 1, 0)
+            # doubling
+            yy=y1*y1 % P
+            s=4*x1*yy % P
+            m=3*x1*x1 % P
+            x3=(m*m - 2*s) % P
+            return (x3, (m*(s - x3) - 8*yy*yy) % P, 2*y1*z1 % P)
+        hh=h*h % P
+        hhh=h*hh % P
+        v=x1*hh % P
+        x3=(r*r - hhh - 2*v) % P
+        y3=(r*(v - x3) - y1*hhh) % P
+        return (x3, y3, z1*h % P)
+
+    @staticmethod
+    def publicPoint(secret):
+        """Returns affine point secret*G."""
+        if KeyGenerator.__table is None:
+            KeyGenerator.__buildTable()
+        P=KeyGenerator.P
+        x,y,z=(0, 1, 0)
+        for i in range(64):
+            point=KeyGenerator.__table[i][(secret >> (4*i)) & 0xf]
+            if point is not None:
+                x,y,z=KeyGenerator.__jacobianAddAffine(x, y, z, point[0], point[1])
+        zInv=pow(z, -1, P)
+        zInv2=zInv*zInv % P
+        return (x*zInv2 % P, y*zInv2*zInv % P)
+
+    @staticmethod
+    def privateKeyToWif(secret):
+        payload=b"\x80" + secret.to_bytes(32, "big")
+        checksum=hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4]
+        return KeyGenerator.b58encode(payload + checksum)
+
+    @staticmethod
+    def wifToPrivateKey(wif):
+        data=KeyGenerator.b58decode(wif)
+        payload,checksum=data[:-4],data[-4:]
+        if hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4] != checksum or payload[0] != 0x80:
+            raise ValueError("Invalid WIF private key %s" % (wif))
+        return int.from_bytes(payload[1:33], "big")
+
+    @staticmethod
+    def publicKeyToStr(point):
+        compressed=bytes([2 + (point[1] & 1)]) + point[0].to_bytes(32, "big")
+        checksum=hashlib.new("ripemd160", compressed).digest()[:4]
+        return KeyGenerator.PublicKeyPrefix + KeyGenerator.b58encode(compressed + checksum)
+
+    @staticmethod
+    def privateToPublic(wif):
+        """Returns public key string of the WIF private key."""
+        return KeyGenerator.publicKeyToStr(KeyGenerator.publicPoint(KeyGenerator.wifToPrivateKey(wif)))
+
+    @staticmethod
+    def generateKeyPair():
+        """Returns (private key WIF string, public key string)."""
+        while True:
+            secret=int.from_bytes(os.urandom(32), "big")
+            if 0 < secret < KeyGenerator.N:
+                break
+        return (KeyGenerator.privateKeyToWif(secret), KeyGenerator.publicKeyToStr(KeyGenerator.publicPoint(secret)))
+
+    @staticmethod
+    def generateKeyPairs(count):
+        return [KeyGenerator.generateKeyPair() for _ in range(count)]
+
+    @staticmethod
+    def isSupported():
+        """ripemd160 is optional in some OpenSSL builds."""
+        try:
+            hashlib.new("ripemd160")
+            return True
+        except ValueError as _:
+            return False
+
+    @staticmethod
+    def generateKeyPairsParallel(count, workers=None, minPerWorker=256):
+        """Generate count key pairs spread over a process pool (one process per core by default). Small requests are
+        served in-process since a pool costs more to start than it saves."""
+        if workers is None:
+            workers=os.cpu_count() or 1
+        workers=min(workers, max(1, count // minPerWorker))
+        if workers <= 1:
+            return KeyGenerator.generateKeyPairs(count)
+
+        chunks=[count // workers + (1 if i < count % workers else 0) for i in range(workers)]
+        keys=[]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunkKeys in executor.map(KeyGenerator.generateKeyPairs, chunks):
+                keys += chunkKeys
+        return keys
@@ -0,0 +1,101 @@
+import math
+import threading
+
+# Latency histogram shared by the load generator, the transaction tracker and the entry node statistics. Values are
+# bucketed HDR style, so recording is O(1), memory does not grow with the sample count and histograms merge exactly.
+
+class LatencyHistogram(object):
+    """HDR style histogram of non-negative integer values (microseconds by default). Values below 2^subBucketBits are
+    recorded exactly, larger values with a relative error under 2^-(subBucketBits-1)."""
+
+    def __init__(self, subBucketBits=7):
+        self.subBucketBits=subBucketBits
+        self.counts={}
+        self.count=0
+        self.total=0
+        self.min=None
+        self.max=None
+        self.__lock=threading.Lock()
+
+    def __bucketIndex(self, value):
+        shift=max(0, value.bit_length() - self.subBucketBits)
+        return (shift << self.subBucketBits) + (value >> shift)
+
+    def __bucketRange(self, index):
+        """Returns (lowest, highest) value recorded into bucket index."""
+        shift=index >> self.subBucketBits
+        sub=index & ((1 << self.subBucketBits) - 1)
+        return (sub << shift, ((sub + 1) << shift) - 1)
+
+    def record(self, value, count=1):
+        """Record value count times. A negative count takes back values recorded before (min and max are kept)."""
+        value=max(0, int(value))
+        index=self.__bucketIndex(value)
+        with self.__lock:
+            self.counts[index]=self.counts.get(index, 0) + count
+            self.count += count
+            self.total += value*count
+            self.min=value if self.min is None else min(self.min, value)
+            self.max=value if self.max is None else max(self.max, value)
+
+    def __getstate__(self):
+        state=dict(self.__dict__)
+        del state["_LatencyHistogram__lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock=threading.Lock()
+
+    def recordSeconds(self, seconds):
+        self.record(seconds*1000000)
+
+    def merge(self, other):
+        assert(self.subBucketBits == other.subBucketBits)
+        with self.__lock:
+            for index,count in other.counts.items():
+                self.counts[index]=self.counts.get(index, 0) + count
+            self.count += other.count
+            self.total += other.total
+            if other.min is not None:
+                self.min=other.min if self.min is None else min(self.min, other.min)
+                self.max=other.max if self.max is None else max(self.max, other.max)
+
+    def mean(self):
+        return self.total / self.count if self.count > 0 else None
+
+    def percentile(self, pct):
+        """Returns the value at or below which pct percent of recorded values fall (upper bound of its bucket, capped
+        at the recorded maximum). None if empty."""
+        if self.count == 0:
+            return None
+        rank=max(1, int(math.ceil(self.count * pct / 100.0)))
+        seen=0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.__bucketRange(index)[1], self.max)
+        return self.max
+
+    def toDict(self):
+        return {"subBucketBits": self.subBucketBits, "counts": self.counts, "count": self.count, "total": self.total,
+                "min": self.min, "max": self.max}
+
+    @staticmethod
+    def fromDict(obj):
+        """Inverse of toDict (json keys come back as strings)."""
+        histogram=LatencyHistogram(obj["subBucketBits"])
+        histogram.counts={int(index): count for index,count in obj["counts"].items()}
+        histogram.count=obj["count"]
+        histogram.total=obj["total"]
+        histogram.min=obj["min"]
+        histogram.max=obj["max"]
+        return histogram
+
+    def summary(self, unit=1000.0, unitName="ms"):
+        if self.count == 0:
+            return "no samples"
+        return "count %d, min %.1f%s, mean %.1f%s, p50 %.1f%s, p90 %.1f%s, p99 %.1f%s, p99.9 %.1f%s, max %.1f%s" % (
+            self.count, self.min/unit, unitName, self.mean()/unit, unitName, self.percentile(50)/unit, unitName,
+            self.percentile(90)/unit, unitName, self.percentile(99)/unit, unitName, self.percentile(99.9)/unit,
+            unitName, self.max/unit, unitName)
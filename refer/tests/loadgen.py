@@ -0,0 +1,449 @@
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import random
+import threading
+import time
+
+import testUtils
+from latency_histogram import LatencyHistogram
+
+# Open-loop load generation. Arrivals follow a fixed schedule (constant rate or Poisson) independent of how fast the
+# node answers, and a fixed pool of workers submits them. Latency is measured from the scheduled arrival time, so a
+# node that falls behind shows up as growing latency instead of a silently lower offered rate. A single process is
+# bound by the GIL, so ShardedLoadGenerator forks one LoadGenerator per shard and merges their reports.
+
+class ArrivalSchedule(object):
+    """Scheduled arrival offsets (seconds from start) for rate arrivals per second.
+    arrival "constant": token bucket with a one token burst, i.e. evenly spaced arrivals.
+    arrival "poisson": exponentially distributed gaps with mean 1/rate."""
+
+    Constant="constant"
+    Poisson="poisson"
+
+    def __init__(self, rate, arrival=Constant, seed=None):
+        assert(rate > 0)
+        assert(arrival in (ArrivalSchedule.Constant, ArrivalSchedule.Poisson))
+        self.rate=rate
+        self.arrival=arrival
+        self.random=random.Random(seed)
+
+    def offsets(self, duration=None, count=None):
+        """Generate arrival offsets until duration seconds or count arrivals, whichever comes first."""
+        assert(duration is not None or count is not None)
+        offset=0.0
+        i=0
+        while count is None or i < count:
+            if self.arrival == ArrivalSchedule.Constant:
+                offset=i / self.rate
+            elif i > 0:
+                offset += self.random.expovariate(self.rate)
+            if duration is not None and offset >= duration:
+                return
+            yield offset
+            i += 1
+
+
+class IntervalStats(object):
+    """Acks, failures and latency of submissions acked during one reporting interval."""
+
+    def __init__(self, index, startTime):
+        self.index=index
+        self.startTime=startTime
+        self.endTime=None
+        self.acked=0
+        self.failed=0
+        self.latency=LatencyHistogram()
+
+    def merge(self, other):
+        self.startTime=min(self.startTime, other.startTime)
+        self.endTime=other.endTime if self.endTime is None else max(self.endTime, other.endTime)
+        self.acked += other.acked
+        self.failed += other.failed
+        self.latency.merge(other.latency)
+
+    def throughput(self):
+        elapsed=self.endTime - self.startTime
+        return self.acked / elapsed if elapsed > 0 else 0.0
+
+
+class ResultSink(object):
+    """Append-only JSON lines file of submit results. Each writing thread buffers its records and appends them with a
+    single write once bufferSize records or flushInterval seconds accumulated, so writers do not contend per record and
+    memory stays bounded however long the run. The file is opened for append, so processes (e.g. load shards) may share
+    one path: every flush is one write() of whole lines."""
+
+    def __init__(self, path, bufferSize=1000, flushInterval=0.5):
+        self.path=path
+        self.bufferSize=bufferSize
+        self.flushInterval=flushInterval
+        self.__fd=os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.__local=threading.local()
+        self.__buffers=[]
+        self.__lock=threading.Lock()
+
+    def __buffer(self):
+        buffer=getattr(self.__local, "buffer", None)
+        if buffer is None:
+            buffer=self.__local.buffer=[[], time.time()]
+            with self.__lock:
+                self.__buffers.append(buffer)
+        return buffer
+
+    def __flush(self, buffer):
+        if len(buffer[0]) > 0:
+            data=("\n".join(buffer[0]) + "\n").encode("utf-8")
+            buffer[0]=[]
+            os.write(self.__fd, data)
+        buffer[1]=time.time()
+
+    def write(self, record):
+        """Append record (json serializable) through the calling thread's buffer."""
+        buffer=self.__buffer()
+        buffer[0].append(json.dumps(record, separators=(",", ":")))
+        if len(buffer[0]) >= self.bufferSize or time.time() - buffer[1] >= self.flushInterval:
+            self.__flush(buffer)
+
+    def flush(self):
+        """Write out every thread's buffer. Only call once writers are idle (e.g. after LoadGenerator.run)."""
+        with self.__lock:
+            for buffer in self.__buffers:
+                self.__flush(buffer)
+
+    def close(self):
+        if self.__fd is not None:
+            self.flush()
+            os.close(self.__fd)
+            self.__fd=None
+
+
+class ResultReader(object):
+    """Incremental reader of a ResultSink file, following it while it is written."""
+
+    def __init__(self, path):
+        self.path=path
+        self.offset=0
+        self.__partial=b""
+
+    def poll(self):
+        """Returns list of the complete records appended since the previous poll."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                data=f.read()
+        except FileNotFoundError as _:
+            return []
+        self.offset += len(data)
+        lines=(self.__partial + data).split(b"\n")
+        self.__partial=lines.pop()
+        return [json.loads(line) for line in lines if line]
+
+    def follow(self, done, pollInterval=0.25):
+        """Yield records as they are appended until done (threading.Event) is set and the file is drained."""
+        while True:
+            finished=done.is_set()
+            records=self.poll()
+            yield from records
+            if finished:
+                return
+            if len(records) == 0:
+                done.wait(pollInterval)
+
+
+class LoadResult(object):
+    def __init__(self):
+        self.scheduled=0
+        self.acked=0
+        self.failed=0
+        # scheduled but never submitted because the generator was stopped
+        self.cancelled=0
+        self.startTime=None
+        self.endTime=None
+        # latency from scheduled arrival to ack (includes time queued waiting on a worker)
+        self.latency=LatencyHistogram()
+        # latency from actual submit to ack
+        self.serviceTime=LatencyHistogram()
+        # time from scheduled arrival to actual submit
+        self.queueDelay=LatencyHistogram()
+        # (sequence number, submit result) for every acked submission, unless written to a ResultSink or not kept
+        self.results=[]
+
+    def merge(self, other):
+        """Fold another (concurrently run) result into this one."""
+        self.scheduled += other.scheduled
+        self.acked += other.acked
+        self.failed += other.failed
+        self.cancelled += other.cancelled
+        self.startTime=other.startTime if self.startTime is None else min(self.startTime, other.startTime)
+        self.endTime=other.endTime if self.endTime is None else max(self.endTime, other.endTime)
+        self.latency.merge(other.latency)
+        self.serviceTime.merge(other.serviceTime)
+        self.queueDelay.merge(other.queueDelay)
+        self.results += other.results
+
+    def elapsed(self):
+        return self.endTime - self.startTime
+
+    def throughput(self):
+        elapsed=self.elapsed()
+        return self.acked / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        lines=["scheduled %d, acked %d, failed %d, cancelled %d in %.3f s (%.2f acked/s)" % (
+            self.scheduled, self.acked, self.failed, self.cancelled, self.elapsed(), self.throughput())]
+        lines.append("latency:      %s" % (self.latency.summary()))
+        lines.append("service time: %s" % (self.serviceTime.summary()))
+        lines.append("queue delay:  %s" % (self.queueDelay.summary()))
+        return "\n".join(lines)
+
+
+class LoadGenerator(object):
+    """Drive submit(seq) at a fixed offered rate from a fixed pool of worker threads. submit returns a result for
+    success, None (or raises) for failure, or LoadGenerator.Stop when it has nothing left to submit. With a sink
+    (ResultSink) success results are written to it as they arrive instead of being kept in LoadResult.results; without
+    keepResults they are only counted."""
+
+    Stop=object()
+
+    def __init__(self, submit, rate, workers=16, arrival=ArrivalSchedule.Constant, seed=None, sink=None,
+                 keepResults=True):
+        self.submit=submit
+        self.rate=rate
+        self.workers=workers
+        self.sink=sink
+        self.keepResults=keepResults
+        self.schedule=ArrivalSchedule(rate, arrival, seed)
+        self.__stopped=threading.Event()
+        self.__interval=None
+
+    def stop(self):
+        """Stop scheduling; arrivals not yet submitted are cancelled."""
+        self.__stopped.set()
+
+    def __work(self, pending, result, lock):
+        while True:
+            item=pending.get()
+            if item is None:
+                return
+            seq,scheduledTime=item
+            ret=LoadGenerator.Stop
+            submitTime=time.time()
+            if not self.__stopped.is_set():
+                try:
+                    ret=self.submit(seq)
+                except Exception as ex: # pylint: disable=broad-except
+                    testUtils.Utils.Print("load generator submit %d failed: %s" % (seq, ex))
+                    ret=None
+            ackTime=time.time()
+            with lock:
+                if ret is LoadGenerator.Stop:
+                    self.__stopped.set()
+                    result.cancelled += 1
+                    continue
+                if ret is None:
+                    result.failed += 1
+                    if self.__interval is not None:
+                        self.__interval.failed += 1
+                    continue
+                result.acked += 1
+                if self.sink is None and self.keepResults:
+                    result.results.append((seq, ret))
+                if self.__interval is not None:
+                    self.__interval.acked += 1
+                    self.__interval.latency.recordSeconds(ackTime - scheduledTime)
+            if self.sink is not None:
+                self.sink.write(ret)
+            result.latency.recordSeconds(ackTime - scheduledTime)
+            result.serviceTime.recordSeconds(ackTime - submitTime)
+            result.queueDelay.recordSeconds(submitTime - scheduledTime)
+
+    def __report(self, lock, interval, onInterval, done):
+        while not done.wait(max(0, self.__interval.startTime + interval - time.time())):
+            now=time.time()
+            with lock:
+                stats=self.__interval
+                stats.endTime=now
+                self.__interval=IntervalStats(stats.index + 1, now)
+            onInterval(stats)
+
+    def run(self, duration=None, count=None, interval=None, onInterval=None):
+        """Offer load for duration seconds or count submissions. Returns LoadResult once every scheduled submission
+        has been acked or failed. With interval set, onInterval(IntervalStats) is called every interval seconds and
+        once more for the final partial interval."""
+        self.__stopped.clear()
+        result=LoadResult()
+        pending=queue.Queue()
+        lock=threading.Lock()
+        threads=[threading.Thread(target=self.__work, args=(pending, result, lock), daemon=True)
+                 for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        result.startTime=time.time()
+        reporter=None
+        done=threading.Event()
+        if interval is not None:
+            assert(onInterval is not None)
+            self.__interval=IntervalStats(0, result.startTime)
+            reporter=threading.Thread(target=self.__report, args=(lock, interval, onInterval, done), daemon=True)
+            reporter.start()
+
+        for offset in self.schedule.offsets(duration, count):
+            if self.__stopped.is_set():
+                break
+            scheduledTime=result.startTime + offset
+            delay=scheduledTime - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            pending.put((result.scheduled, scheduledTime))
+            result.scheduled += 1
+
+        for _ in threads:
+            pending.put(None)
+        for thread in threads:
+            thread.join()
+        if self.sink is not None:
+            self.sink.flush()
+        result.endTime=time.time()
+        if reporter is not None:
+            done.set()
+            reporter.join()
+            stats=self.__interval
+            stats.endTime=result.endTime
+            self.__interval=None
+            onInterval(stats)
+        result.results.sort(key=lambda r: r[0])
+        return result
+
+
+class LoadShard(object):
+    """One worker process of a ShardedLoadGenerator. makeSubmit() is called in the worker process and returns the
+    submit function for its LoadGenerator, so connections, accounts and any pre-signing belong to that process. submit
+    results are sent back to the coordinator and must be picklable (e.g. transaction ids), or with sinkPath set are
+    appended to that ResultSink file by the worker process instead."""
+
+    def __init__(self, name, makeSubmit, rate, count=None, duration=None, workers=16, arrival=ArrivalSchedule.Constant,
+                 seed=None, sinkPath=None):
+        assert(count is not None or duration is not None)
+        self.name=name
+        self.makeSubmit=makeSubmit
+        self.rate=rate
+        self.count=count
+        self.duration=duration
+        self.workers=workers
+        self.arrival=arrival
+        self.seed=seed
+        self.sinkPath=sinkPath
+
+
+class ShardedLoadGenerator(object):
+    """Run each LoadShard in its own forked process. Shards prepare concurrently, then start together; their interval
+    reports stream back over pipes and are merged per interval index once every running shard has reported it."""
+
+    def __init__(self, shards, interval=1.0, onInterval=None):
+        assert(len(shards) > 0)
+        assert(len(set(shard.name for shard in shards)) == len(shards))
+        self.shards=shards
+        self.interval=interval
+        self.onInterval=onInterval if onInterval is not None else ShardedLoadGenerator.printInterval
+
+    @staticmethod
+    def printInterval(stats, shardCount):
+        testUtils.Utils.Print("interval %d: %d transaction(s) acked in %d shard(s), %d transaction(s) failed, %.2f acked/s, "
+                              "latency %s" % (stats.index, stats.acked, shardCount, stats.failed, stats.throughput(), stats.latency.summary()))
+
+    @staticmethod
+    def runShard(shard, interval, conn):
+        sink=None
+        try:
+            sink=ResultSink(shard.sinkPath) if shard.sinkPath is not None else None
+            generator=LoadGenerator(shard.makeSubmit(), shard.rate, shard.workers, shard.arrival, shard.seed, sink)
+            conn.send(("ready",))
+            if conn.recv() != "start":
+                return
+            result=generator.run(shard.duration, shard.count, interval, lambda stats: conn.send(("interval", stats)))
+            conn.send(("done", result))
+        except Exception as ex: # pylint: disable=broad-except
+            conn.send(("error", "%s: %s" % (type(ex).__name__, ex)))
+        finally:
+            if sink is not None:
+                sink.close()
+            conn.close()
+
+    def run(self):
+        """Returns (merged LoadResult, dict of shard name to its LoadResult, None for shards that failed)."""
+        context=multiprocessing.get_context("fork")
+        conns={}
+        processes=[]
+        for shard in self.shards:
+            parentConn,childConn=context.Pipe()
+            process=context.Process(target=ShardedLoadGenerator.runShard, args=(shard, self.interval, childConn),
+                                    name="load-%s" % (shard.name), daemon=True)
+            process.start()
+            childConn.close()
+            conns[parentConn]=shard.name
+            processes.append(process)
+
+        results={}
+        def receive(conn):
+            try:
+                return conn.recv()
+            except EOFError as _:
+                return ("error", "worker process exited")
+
+        def fail(conn, msg):
+            testUtils.Utils.Print("ERROR: load shard %s failed. %s" % (conns[conn], msg))
+            results[conns.pop(conn)]=None
+            conn.close()
+
+        # every shard prepares (e.g. signs) before any starts offering load
+        for conn in list(conns):
+            msg=receive(conn)
+            if msg[0] != "ready":
+                fail(conn, msg[1] if len(msg) > 1 else msg)
+        for conn in conns:
+            conn.send("start")
+
+        pending={} # interval index -> (merged IntervalStats, set of reporting shard names)
+        nextIndex=0
+        def flush(force=False):
+            nonlocal nextIndex
+            running=set(conns.values())
+            while nextIndex in pending:
+                stats,reported=pending[nextIndex]
+                if not force and not running.issubset(reported):
+                    return
+                self.onInterval(stats, len(reported))
+                del pending[nextIndex]
+                nextIndex += 1
+
+        while len(conns) > 0:
+            for conn in multiprocessing.connection.wait(list(conns)):
+                msg=receive(conn)
+                if msg[0] == "interval":
+                    stats=msg[1]
+                    if stats.index in pending:
+                        pending[stats.index][0].merge(stats)
+                        pending[stats.index][1].add(conns[conn])
+                    else:
+                        pending[stats.index]=(stats, set([conns[conn]]))
+                elif msg[0] == "done":
+                    results[conns.pop(conn)]=msg[1]
+                    conn.close()
+                else:
+                    fail(conn, msg[1] if len(msg) > 1 else msg)
+            flush()
+        flush(force=True)
+
+        for process in processes:
+            process.join()
+
+        merged=LoadResult()
+        for result in results.values():
+            if result is not None:
+                merged.merge(result)
+        if merged.startTime is None:
+            merged.startTime=merged.endTime=time.time()
+        return (merged, results)
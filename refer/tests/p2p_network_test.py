@@ -9,6 +9,7 @@ import p2p_stress
 import copy
 import decimal
 import argparse
+import asyncio
 import random
 import re
 import time
@@ -39,9 +40,26 @@ parser.add_argument("--wallet_port", type=int, help="wallet port", default=8899)
 parser.add_argument("--impaired_network", help="test impaired network", action='store_true')
 parser.add_argument("--lossy_network", help="test lossy network", action='store_true')
 parser.add_argument("--stress_network", help="test load/stress network", action='store_true')
+parser.add_argument("--stress_processes", type=int, help="load generating processes for stress_network", default=1)
+parser.add_argument("--stress_workload", type=str, help="stress_network transfer shape: fanin, paired, zipf or graph", default=None)
+parser.add_argument("--stress_accounts", type=int, help="accounts taking part in the stress_network workload", default=8)
+parser.add_argument("--stress_seed", type=int, help="stress_network workload seed", default=0)
+parser.add_argument("--stress_results_file", type=str, help="stream stress_network results to this file and verify them during the run", default=None)
+parser.add_argument("--stress_entry_policy", choices=testUtils.NodeSelector.Policies, help="spread single process stress_network submissions over the hosts by this policy", default=None)
+parser.add_argument("--stress_entry_weights", type=str, help="comma separated per host weights of the weighted entry policy", default=None)
+parser.add_argument("--stress_saturate", help="search the highest sustainable stress_network rate of each host instead of the fixed speeds", action='store_true')
+parser.add_argument("--stress_slo_ms", type=int, help="stress_saturate p99 latency objective in milliseconds", default=1000)
+parser.add_argument("--stress_max_failure_rate", type=float, help="stress_saturate tolerated failed fraction of transfers", default=0.01)
+parser.add_argument("--stress_trial_sec", type=int, help="stress_saturate seconds per offered rate", default=5)
+parser.add_argument("--stress_topology", type=str, help="topology label of the stress_saturate report", default=None)
 parser.add_argument("--not_kill_wallet", help="not killing walletd", action='store_true')
 
 args = parser.parse_args()
+if args.stress_network and args.stress_workload is not None:
+    if args.stress_accounts < 2:
+        errorExit("--stress_accounts must be at least 2 for the %s workload, got %d." % (args.stress_workload, args.stress_accounts))
+    if args.stress_workload == "paired" and args.stress_accounts % 2 != 0:
+        errorExit("--stress_accounts must be even for the paired workload (half send, half receive), got %d." % (args.stress_accounts))
 testOutputFile=args.output
 enableMongo=False
 defproduceraPrvtKey=args.defproducera_prvt_key
@@ -144,6 +162,21 @@ node0=cluster.getNode(0)
 if node0 is None:
     errorExit("cluster in bad state, received None node")
 
+if args.stress_network:
+    # each load process targets its own host
+    module.processes=args.stress_processes
+    module.nodes=[cluster.getNode(i) for i in range(len(hosts))]
+    module.workload=args.stress_workload
+    module.workloadAccounts=args.stress_accounts
+    module.seed=args.stress_seed
+    module.resultsFile=args.stress_results_file
+    module.entryPolicy=args.stress_entry_policy
+    if args.stress_entry_weights is not None:
+        module.entryWeights=[float(weight) for weight in args.stress_entry_weights.split(",")]
+    module.sloMs=args.stress_slo_ms
+    module.maxFailureRate=args.stress_max_failure_rate
+    module.trialSec=args.stress_trial_sec
+
 # io should have the same key as defproducera
 io = copy.copy(defproduceraAccount)
 io.name = "io"
@@ -166,31 +199,55 @@ else:
     Print("transaction id %s" % (node0.getTransId(trans)))
 
 try:
-    maxIndex = module.maxIndex()
+    if args.stress_network and args.stress_saturate:
+        topology = args.stress_topology if args.stress_topology is not None else "%d host(s)" % (len(hosts))
+        report = module.saturate(node0, testeraAccount, io, topology)
+        if len(report) == 0:
+            errorExit("saturation search failed")
+    maxIndex = module.maxIndex() if not (args.stress_network and args.stress_saturate) else 0
     for cmdInd in range(maxIndex):
         (transIdList, checkacct, expBal, errmsg) = module.execute(cmdInd, node0, testeraAccount, io)
 
         if len(transIdList) == 0 and len(checkacct) == 0:
             errorExit("failed to execute command in host %s:%s" % (hosts[0], errmsg))
 
+        # query every host (and every transaction on it) concurrently over HTTP, one after the other through cl
+        async def checkHost(i):
+            node = cluster.getNode(i).asyncNode()
+            actBal = None
+            if len(checkacct) > 0:
+                actBal = await node.getAccountBalance(checkacct)
+            transactions = await asyncio.gather(*[node.getTransaction(transId) for transId in transIdList])
+            return (actBal, transactions)
+
+        def checkHostWithClient(i):
+            node = cluster.getNode(i)
+            actBal = None
+            if len(checkacct) > 0:
+                actBal = node.getAccountBalance(checkacct)
+            transactions = [node.getTransaction(transId) for transId in transIdList]
+            return (actBal, transactions)
+
         successhosts = []
         attempts = 2
         while attempts > 0 and len(successhosts) < len(hosts):
             attempts = attempts - 1
-            for i in range(len(hosts)):
+            pending = [i for i in range(len(hosts)) if hosts[i] not in successhosts]
+            if testUtils.Utils.UseHttp:
+                results = testUtils.Utils.runAsyncAll([checkHost(i) for i in pending])
+            else:
+                results = [checkHostWithClient(i) for i in pending]
+            for i, (actBal, transactions) in zip(pending, results):
                 host = hosts[i]
-                if host in successhosts:
-                    continue
                 if len(checkacct) > 0:
-                    actBal = cluster.getNode(i).getAccountBalance(checkacct)
                     if expBal == actBal:
                         Print("acct balance verified in host %s" % (host))
                     else:
-                        Print("acct balance check failed in host %s, expect %d actual %d" % (host, expBal, actBal))
+                        Print("acct balance check failed in host %s, expect %d actual %s" % (host, expBal, actBal))
                 okcount = 0
                 failedcount = 0
-                for j in range(len(transIdList)):
-                    if cluster.getNode(i).getTransaction(transIdList[j]) is None:
+                for trans in transactions:
+                    if trans is None:
                         failedcount = failedcount + 1
                     else:
                         okcount = okcount + 1
@@ -1,17 +1,95 @@
 import testUtils
 import p2p_test_peers
 import random
+import threading
 import time
 import copy
-import threading
+
+from loadgen import LoadGenerator, LoadShard, ShardedLoadGenerator, ResultSink, ResultReader
+from tx_corpus import TxCorpus
+from trx_tracker import TransactionTracker
+from workloads import Workload, FanInWorkload, createWorkload
 
 from core_symbol import CORE_SYMBOL
 
+class StressVerifier:
+    """Consumes submit results (transfer seq, transaction id, submit time, accept time) as they arrive: hands ids to
+    the tracker (or waits for each on node without one), accumulates the balance changes of acked transfers and keeps
+    the transaction ids the hosts are checked with, all of them or a reservoir sample of sampleSize."""
+
+    def __init__(self, node, transfers, tracker, sampleSize=None, seed=0):
+        self.node = node
+        self.transfers = transfers
+        self.tracker = tracker
+        self.sampleSize = sampleSize
+        self.random = random.Random(seed)
+        self.count = 0
+        self.deltas = {}
+        self.transIds = []
+
+    def add(self, record):
+        seq, trid, submitTime, acceptTime = record
+        if self.tracker is not None:
+            self.tracker.track(trid, submitTime, acceptTime)
+        else:
+            self.node.waitForTransIdOnNode(trid)
+        for name, delta in Workload.ledger([self.transfers[seq]]).items():
+            self.deltas[name] = self.deltas.get(name, 0) + delta
+        self.count = self.count + 1
+        if self.sampleSize is None or len(self.transIds) < self.sampleSize:
+            self.transIds.append(trid)
+        else:
+            i = self.random.randrange(self.count)
+            if i < self.sampleSize:
+                self.transIds[i] = trid
+
+    def consume(self, records):
+        for record in records:
+            self.add(record)
+
+    def expectedBalances(self, initialBalances):
+        return {name: balance + self.deltas.get(name, 0) for name, balance in initialBalances.items()}
+
+
 class StressNetwork:
     speeds=[1,5,10,30,60,100,500]
     sec=10
     maxthreads=100
-    trList=[]
+    # "constant" or "poisson" transfer arrivals
+    arrival="constant"
+    # sign all transfers before the measured window and replay them (needs the HTTP API)
+    presign=False
+    # worker processes generating load, each with its own sender account; targets are spread over nodes (the node
+    # passed to execute if not set)
+    processes=1
+    nodes=None
+    # seconds between per interval reports of sharded runs
+    interval=1.0
+    # also wait for (and report latency to) irreversibility, not just block inclusion
+    waitIrreversible=False
+    # transfer workload shape (a workloads.Workloads name) over workloadAccounts fresh accounts, seeded by seed. None
+    # keeps the original shape: one receiver fed by one sender per process
+    workload=None
+    workloadAccounts=8
+    seed=0
+    # saturation search (see saturate): a trial passes when its p99 arrival to ack latency is within sloMs, at most
+    # maxFailureRate of its transfers fail and at least minAcceptRatio of the offered rate is acked. Trials last
+    # trialSec; the search stops once the passing and failing rates are within searchPrecision of each other.
+    sloMs=1000
+    maxFailureRate=0.01
+    minAcceptRatio=0.9
+    trialSec=5
+    searchPrecision=0.1
+    startRate=10
+    maxRate=20000
+    # stream submit results to this JSON lines file (rewritten by every execute) and verify them while load is still
+    # generated, so long soak runs do not hold every result in memory; hosts are then checked with checkSample ids
+    resultsFile=None
+    checkSample=1000
+    # single process runs spread submissions over nodes by this testUtils.NodeSelector policy (None submits through
+    # the node passed to execute), weighted by entryWeights under the weighted policy
+    entryPolicy=None
+    entryWeights=None
 
     def maxIndex(self):
         return len(self.speeds)
@@ -22,84 +100,279 @@ class StressNetwork:
             s=s+random.choice("abcdefghijklmnopqrstuvwxyz12345")
         return s
     
-    def _transfer(self, node, acc1, acc2, amount, threadId, round):
-        memo="%d %d" % (threadId, round)
-        tr = node.transferFunds(acc1, acc2, amount, memo)
-        self.trList.append(tr)
+    def _transfer(self, node, transfer):
+        return node.transferFunds(transfer.sender, transfer.receiver,
+                                  testUtils.Node.currencyIntToStr(transfer.amount, CORE_SYMBOL), "%d" % (transfer.seq))
 
-    def execute(self, cmdInd, node, ta, io):
-        print("\n==== network stress test: %d transaction(s)/s for %d secs ====" % (self.speeds[cmdInd], self.sec))
-        total = self.speeds[cmdInd] * self.sec
+    def _push(self, node, packed):
+        try:
+            return node.rpcCall("/v1/chain/push_transaction", packed)
+        except testUtils.RpcError as ex:
+            if testUtils.Utils.Debug: print("push transaction failed on %s: %s" % (node, ex))
+            return None
 
+    def _submitter(self, node, transfers, selector=None):
+        """Load generator submit function sending transfers[seq] through node, or the entry node picked by selector,
+        signed up front (through node) if presign is set. Returns (transfer seq, transaction id, submit time, accept
+        time)."""
+        if self.presign and node.rpcPushEnabled():
+            t0 = time.time()
+            signed = list(TxCorpus.sign(node, [[Workload.action(transfer)] for transfer in transfers]))
+            print("signed %d transfers in %lf secs" % (len(signed), time.time() - t0))
+            push = lambda seq, target: self._push(target, signed[seq])
+        else:
+            push = lambda seq, target: self._transfer(target, transfers[seq])
+
+        def submit(seq):
+            t0 = time.time()
+            if selector is not None:
+                tr = selector.submit(lambda target: push(seq, target))
+            else:
+                tr = push(seq, node)
+            if tr is None:
+                return None
+            return (transfers[seq].seq, node.getTransId(tr), t0, time.time())
+        return submit
+
+    def _createAccount(self, node, ta, io):
         ta.name = self.randAcctName()
-        acc1 = copy.copy(ta)
+        acc = copy.copy(ta)
         print("creating new account %s" % (ta.name))
         tr = node.createAccount(ta, io, stakedDeposit=0, waitForTransBlock=True)
         trid = node.getTransId(tr)
         if trid is None:
-            return ([], "", 0.0, "failed to create account")
+            return None
         print("transaction id %s" % (trid))
+        return acc
 
-        ta.name = self.randAcctName()
-        acc2 = copy.copy(ta)
-        print("creating new account %s" % (ta.name))
-        tr = node.createAccount(ta, io, stakedDeposit=0, waitForTransBlock=True)
-        trid = node.getTransId(tr)
-        if trid is None:
+    def _shard(self, shardId, target, transfers, rate, nthreads, resultsFile=None):
+        """LoadShard sending transfers through target from a forked process."""
+        def makeSubmit():
+            # fresh connections, the parent's pooled sockets must not be shared with the child
+            node = testUtils.Node(target.host, target.port)
+            walletUrl = testUtils.HttpClient.parseUrl(target.endpointArgs)
+            if walletUrl is not None:
+                node.setWalletEndpointArgs("--wallet-url http://%s:%d" % walletUrl)
+            return self._submitter(node, transfers)
+        return LoadShard("%d@%s:%d" % (shardId, target.host, target.port), makeSubmit, rate, count=len(transfers),
+                         workers=nthreads, arrival=self.arrival, sinkPath=resultsFile)
+
+
+    def _prepare(self, node, ta, io, processes):
+        """Create the accounts of the configured workload. Returns (accounts, workload), None on failure."""
+        accountCount = processes + 1 if self.workload is None else self.workloadAccounts
+        accounts = []
+        for _ in range(accountCount):
+            acc = self._createAccount(node, ta, io)
+            if acc is None:
+                return None
+            accounts.append(acc)
+
+        if self.workload is None:
+            workload = FanInWorkload(accounts, self.seed)
+        else:
+            workload = createWorkload(self.workload, accounts, self.seed)
+        return (accounts, workload)
+
+    def _fund(self, node, names, issueAmount):
+        for name in names:
+            print("issue currency0000 into %s" % (name))
+            contract="io"
+            action="issue"
+            data="{\"to\":\"" + name + "\",\"quantity\":\"" + testUtils.Node.currencyIntToStr(issueAmount, CORE_SYMBOL) + "\"}"
+            opts="--permission io@active"
+            tr=node.pushMessage(contract, action, data, opts)
+            trid = node.getTransId(tr[1])
+            if trid is None:
+                return False
+            print("transaction id %s" % (trid))
+            node.waitForTransIdOnNode(trid)
+        return True
+
+    def _run(self, node, accounts, transfers, rate, processes, targets=None, resultsFile=None):
+        """Offer transfers at rate through node, or sharded by sender over targets (default nodes) in processes
+        forked processes. Returns the merged LoadResult, whose results are appended to resultsFile instead if set.
+        Without targets a single process spreads submissions over nodes by entryPolicy, if set."""
+        nthreads = max(1, min(self.maxthreads, int(rate)))
+        if processes <= 1:
+            selector = None
+            if targets is None and self.entryPolicy is not None and self.nodes:
+                selector = testUtils.NodeSelector(self.nodes, self.entryPolicy, self.entryWeights)
+            sink = ResultSink(resultsFile) if resultsFile is not None else None
+            generator = LoadGenerator(self._submitter(node, transfers, selector), rate, workers=nthreads,
+                                      arrival=self.arrival, sink=sink)
+            result = generator.run(count=len(transfers))
+            if sink is not None:
+                sink.close()
+            if selector is not None:
+                print(selector.report())
+            return result
+
+        # shards own disjoint sender sets, each submitting through one target
+        if targets is None:
+            targets = self.nodes if self.nodes else [node]
+        accountIdx = {acc.name: i for i, acc in enumerate(accounts)}
+        shardTransfers = [[] for _ in range(processes)]
+        for transfer in transfers:
+            shardTransfers[accountIdx[transfer.sender.name] % processes].append(transfer)
+        shards = []
+        for k in range(processes):
+            if len(shardTransfers[k]) == 0:
+                continue
+            shards.append(self._shard(k, targets[k % len(targets)], shardTransfers[k],
+                                      rate * len(shardTransfers[k]) / len(transfers), max(1, nthreads // processes),
+                                      resultsFile))
+        result, shardResults = ShardedLoadGenerator(shards, self.interval).run()
+        for name, shardResult in sorted(shardResults.items()):
+            if shardResult is None:
+                print("shard %s failed" % (name))
+            else:
+                print("%d transaction(s) acked by shard %s, %d transaction(s) failed" % (shardResult.acked, name, shardResult.failed))
+        return result
+
+    def execute(self, cmdInd, node, ta, io):
+        print("\n==== network stress test: %d transaction(s)/s for %d secs ====" % (self.speeds[cmdInd], self.sec))
+        total = self.speeds[cmdInd] * self.sec
+        processes = max(1, min(self.processes, self.speeds[cmdInd]))
+
+        prepared = self._prepare(node, ta, io, processes)
+        if prepared is None:
             return ([], "", 0.0, "failed to create account")
-        print("transaction id %s" % (trid))
+        accounts, workload = prepared
+        transfers = workload.transfers(total)
 
-        print("issue currency0000 into %s" % (acc1.name))
-        contract="io"
-        action="issue"
-        data="{\"to\":\"" + acc1.name + "\",\"quantity\":\"1000000.0000 "+CORE_SYMBOL+"\"}"
-        opts="--permission io@active"
-        tr=node.pushMessage(contract, action, data, opts)
-        trid = node.getTransId(tr[1])
-        if trid is None:
+        issueAmount = 10000000000 # 1000000.0000
+        outgoing = Workload.outgoing(transfers)
+        assert(max(outgoing.values()) <= issueAmount)
+        if not self._fund(node, sorted(outgoing), issueAmount):
             return ([], "", 0.0, "failed to issue currency0000")
-        print("transaction id %s" % (trid))
-        node.waitForTransIdOnNode(trid)
+        initialBalances = {acc.name: issueAmount if acc.name in outgoing else 0 for acc in accounts}
 
-        self.trList = []
-        expBal = 0
-        nthreads=self.maxthreads
-        if nthreads > self.speeds[cmdInd]:
-            nthreads = self.speeds[cmdInd]
-        cycle = int(total / nthreads)
-        total = cycle * nthreads # rounding
-        delay = 1.0 / self.speeds[cmdInd] * nthreads
+        tracker = None
+        if node.useBlockFollower():
+            tracker = TransactionTracker(node, keepRecords=self.resultsFile is None)
+            tracker.start()
 
-        print("start currency0000 trasfer from %s to %s for %d times with %d threads" % (acc1.name, acc2.name, total, nthreads))
+        print("start %s currency0000 trasfers among %d accounts for %d times in %d process(es)" % (
+            self.workload if self.workload else "fanin", len(accounts), total, processes))
+        if self.resultsFile is None:
+            verifier = StressVerifier(node, transfers, tracker)
+            result = self._run(node, accounts, transfers, self.speeds[cmdInd], processes)
+            verifier.consume(ret for _, ret in result.results)
+        else:
+            open(self.resultsFile, "w").close()
+            verifier = StressVerifier(node, transfers, tracker, self.checkSample, self.seed)
+            done = threading.Event()
+            verifyThread = threading.Thread(target=verifier.consume, args=(ResultReader(self.resultsFile).follow(done),),
+                                            daemon=True)
+            verifyThread.start()
+            try:
+                result = self._run(node, accounts, transfers, self.speeds[cmdInd], processes, resultsFile=self.resultsFile)
+            finally:
+                done.set()
+                verifyThread.join()
+            print("%d result(s) streamed to %s" % (verifier.count, self.resultsFile))
+        print("time used = %lf" % (result.elapsed()))
+        print(result.report())
 
-        t00 = time.time()
-        for k in range(cycle):
-            t0 = time.time()
-            amount = 1
-            threadList = []
-            for m in range(nthreads):
-                th = threading.Thread(target = self._transfer,args = (node, acc1, acc2, amount, m, k))
-                th.start()
-                threadList.append(th)
-            for th in threadList:
-                th.join()
-            expBal = expBal + amount * nthreads
-            t1 = time.time()
-            if (t1-t0 < delay):
-                time.sleep(delay - (t1-t0))
-        t11 = time.time()
-        print("time used = %lf" % (t11 - t00))
-
-        actBal = node.getAccountBalance(acc2.name)
-        print("account %s: expect Balance:%d, actual Balance %d" % (acc2.name, expBal, actBal))
-
-        transIdlist = []
-        for tr in self.trList:
-            trid = node.getTransId(tr)
-            transIdlist.append(trid)
-            node.waitForTransIdOnNode(trid)
-        return (transIdlist, acc2.name, expBal, "")
+        if tracker is not None:
+            tracker.waitForInclusion()
+            if self.waitIrreversible:
+                tracker.waitForIrreversible()
+            print(tracker.report())
+            tracker.stop()
+
+        transIdlist = verifier.transIds
+        expected = verifier.expectedBalances(initialBalances)
+        actual = node.getBalanceSnapshot([acc.name for acc in accounts])
+        mismatched = testUtils.Node.diffBalances(expected, actual)
+        for name, (expBal, actBal) in sorted(mismatched.items()):
+            print("account %s: expect Balance:%d, actual Balance %s" % (name, expBal, actBal))
+        print("%d of %d account balance(s) as expected" % (len(accounts) - len(mismatched), len(accounts)))
+
+        # hosts check the account receiving the most
+        checkacct = max(accounts, key=lambda acc: expected[acc.name] - initialBalances[acc.name]).name
+        return (transIdlist, checkacct, expected[checkacct], "")
     
+    def _trial(self, node, accounts, workload, rate, seqOffset, processes):
+        """Offer rate transfers/s for trialSec through node. Returns (passed, trial stats dictionary)."""
+        count = max(1, int(rate * self.trialSec))
+        transfers = [transfer._replace(seq=seqOffset + transfer.seq) for transfer in workload.transfers(count)]
+        result = self._run(node, accounts, transfers, rate, processes, [node])
+        p99Ms = result.latency.percentile(99) / 1000.0 if result.acked > 0 else float("inf")
+        failureRate = result.failed / float(max(1, result.scheduled))
+        acceptRatio = result.throughput() / rate
+        passed = p99Ms <= self.sloMs and failureRate <= self.maxFailureRate and acceptRatio >= self.minAcceptRatio
+        stats = {"rate": rate, "acked": result.acked, "failed": result.failed, "throughput": result.throughput(),
+                 "p50_ms": result.latency.percentile(50) / 1000.0 if result.acked > 0 else None, "p99_ms": p99Ms,
+                 "failure_rate": failureRate, "accept_ratio": acceptRatio, "passed": passed}
+        print("trial %8.1f transaction(s)/s on %s:%d: %s, %.1f acked/s, p99 %.1fms, %.2f%% failed" % (
+            rate, node.host, node.port, "pass" if passed else "FAIL", result.throughput(), p99Ms, failureRate * 100))
+        return (passed, stats)
+
+    def _search(self, node, accounts, workload, processes):
+        """Double the offered rate until a trial fails, then binary search between the last passing and the first
+        failing rate. Returns (knee rate or 0, stats of the knee trial or None, all trial stats)."""
+        trials = []
+        seqOffset = [0]
+        def trial(rate):
+            passed, stats = self._trial(node, accounts, workload, rate, seqOffset[0], processes)
+            seqOffset[0] += int(rate * self.trialSec) + 1
+            trials.append(stats)
+            return (passed, stats)
+
+        low, lowStats, high = 0, None, None
+        rate = self.startRate
+        while rate <= self.maxRate:
+            passed, stats = trial(rate)
+            if not passed:
+                high = rate
+                break
+            low, lowStats = rate, stats
+            rate = rate * 2
+        if high is None:
+            return (low, lowStats, trials)
+
+        while high - low > max(1.0, low * self.searchPrecision):
+            rate = (low + high) / 2.0
+            passed, stats = trial(rate)
+            if passed:
+                low, lowStats = rate, stats
+            else:
+                high = rate
+        return (low, lowStats, trials)
+
+    def saturate(self, node, ta, io, topology=""):
+        """Search the highest transfer rate each target node (nodes, default node) sustains within the SLO. Returns
+        list of per node dictionaries (node, topology, knee, trials)."""
+        print("\n==== network saturation search: p99 latency slo %dms, max failure rate %.2f%% ====" % (
+            self.sloMs, self.maxFailureRate * 100))
+        prepared = self._prepare(node, ta, io, self.processes)
+        if prepared is None:
+            print("failed to create account")
+            return []
+        accounts, workload = prepared
+        # trials draw ever longer prefixes of the workload, fund every account rather than the first trial's senders
+        if not self._fund(node, [acc.name for acc in accounts], 10000000000):
+            print("failed to issue currency0000")
+            return []
+
+        report = []
+        for target in (self.nodes if self.nodes else [node]):
+            knee, kneeStats, trials = self._search(target, accounts, workload, self.processes)
+            report.append({"node": "%s:%d" % (target.host, target.port), "topology": topology, "knee": knee,
+                           "knee_trial": kneeStats, "trials": trials})
+
+        print("\n==== saturation knee points ====")
+        for entry in report:
+            if entry["knee_trial"] is None:
+                print("node %s topology %s: no rate passed (from %d transaction(s)/s)" % (entry["node"], entry["topology"], self.startRate))
+            else:
+                print("node %s topology %s: %.1f transaction(s)/s sustained, p99 %.1fms, %.2f%% failed" % (
+                    entry["node"], entry["topology"], entry["knee"], entry["knee_trial"]["p99_ms"],
+                    entry["knee_trial"]["failure_rate"] * 100))
+        return report
+
     def on_exit(self):
         print("end of network stress tests")
 
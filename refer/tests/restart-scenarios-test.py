@@ -148,6 +148,14 @@ try:
         errorExit("Cluster never synchronized")
     Print ("Cluster synched")
 
+    Print ("Check relaunched nodes for forks.")
+    forks=cluster.findForks()
+    if testUtils.Utils.Debug or any(fork.divergentBlockNum is not None for fork in forks):
+        cluster.printForkReport(forks)
+    # pairs left undetermined (a block could not be fetched) are only reported
+    if any(fork.irreversible for fork in forks):
+        errorExit("Nodes diverged below their last irreversible block")
+
     # TBD: Known issue (Issue 2043) that 'get currency0000 balance' doesn't return balance.
     #  Uncomment when functional
     # Print("Spread funds and validate")
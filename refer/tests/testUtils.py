@@ -6,7 +6,7 @@ import glob
 import shutil
 import os
 import platform
-from collections import namedtuple
+from collections import namedtuple, deque
 import re
 import string
 import signal
@@ -16,8 +16,19 @@ import sys
 import random
 import json
 import shlex
+import threading
+import http.client
+import asyncio
+import struct
+import concurrent.futures
+import contextlib
+import weakref
 
 from core_symbol import CORE_SYMBOL
+from key_generator import KeyGenerator
+from latency_histogram import LatencyHistogram
+from block_archive import BlockArchive
+from json_decoder import JsonDecoder
 
 ###########################################################################################
 class Utils:
@@ -35,6 +46,10 @@ class Utils:
     LauncherPath="programs/io-launcher/io-launcher"
     MongoPath="mongo"
 
+    # UseHttp: talk to nod/kd through pooled keep-alive HTTP connections. When False (or when an endpoint
+    #  is not exposed by the node) Node falls back to forking cl.
+    UseHttp=True
+
     @staticmethod
     def Print(*args, **kwargs):
         stackDepth=len(inspect.stack())-2
@@ -65,6 +80,10 @@ class Utils:
     def setSystemWaitTimeout(timeout):
         Utils.systemWaitTimeout=timeout
 
+    @staticmethod
+    def setUseHttp(useHttp):
+        Utils.UseHttp=useHttp
+
     @staticmethod
     def getChainStrategies():
         chainSyncStrategies={}
@@ -92,29 +111,343 @@ class Utils:
         Utils.Print("ERROR:" if not raw else "", msg)
         exit(errorCode)
 
+    __deadline=None
+
+    @staticmethod
+    def setDeadline(seconds):
+        """Set a global deadline, seconds from now, capping every harness wait. None clears it."""
+        Utils.__deadline=None if seconds is None else time.time()+seconds
+
+    @staticmethod
+    def getDeadline():
+        """Returns global deadline (epoch seconds) or None."""
+        return Utils.__deadline
+
+    @staticmethod
+    @contextlib.contextmanager
+    def deadline(seconds):
+        """Context manager form of setDeadline. Nested deadlines can only shorten the enclosing one."""
+        previous=Utils.__deadline
+        endTime=time.time()+seconds
+        Utils.__deadline=endTime if previous is None else min(previous, endTime)
+        try:
+            yield
+        finally:
+            Utils.__deadline=previous
+
     @staticmethod
-    def waitForObj(lam, timeout=None):
+    def effectiveTimeout(timeout):
+        """Returns timeout capped by the time left before the global deadline."""
+        if Utils.__deadline is None:
+            return timeout
+        return max(0, min(timeout, Utils.__deadline - time.time()))
+
+    @staticmethod
+    def waitForObj(lam, timeout=None, sleepTime=3):
         if timeout is None:
             timeout=60
+        timeout=Utils.effectiveTimeout(timeout)
 
         endTime=time.time()+timeout
         while endTime > time.time():
             ret=lam()
             if ret is not None:
                 return ret
-            sleepTime=3
-            Utils.Print("cmd: sleep %d seconds, remaining time: %d seconds" %
-                        (sleepTime, endTime - time.time()))
+            if sleepTime >= 1 or Utils.Debug:
+                Utils.Print("cmd: sleep %g seconds, remaining time: %d seconds" %
+                            (sleepTime, endTime - time.time()))
             time.sleep(sleepTime)
 
         return None
 
     @staticmethod
-    def waitForBool(lam, timeout=None):
+    def waitForBool(lam, timeout=None, sleepTime=3):
         myLam = lambda: True if lam() else None
-        ret=Utils.waitForObj(myLam, timeout)
+        ret=Utils.waitForObj(myLam, timeout, sleepTime)
         return False if ret is None else ret
 
+    __asyncLoop=None
+    __asyncLoopLock=threading.Lock()
+    __forkResets=weakref.WeakSet() # objects whose resetAfterFork() runs in forked children
+
+    @staticmethod
+    def submitAsync(coro):
+        """Schedule coroutine on the shared harness event loop. Returns concurrent.futures.Future of its result. The
+        loop lives in a daemon thread so AsyncNode connections are reused across calls and callers from any thread."""
+        with Utils.__asyncLoopLock:
+            if Utils.__asyncLoop is None:
+                loop=asyncio.new_event_loop()
+                thread=threading.Thread(target=loop.run_forever, name="harness-asyncio", daemon=True)
+                thread.start()
+                Utils.__asyncLoop=loop
+        return asyncio.run_coroutine_threadsafe(coro, Utils.__asyncLoop)
+
+    @staticmethod
+    def runAsync(coro, timeout=None):
+        """Run coroutine on the shared harness event loop and return its result."""
+        return Utils.submitAsync(coro).result(timeout)
+
+    @staticmethod
+    def runAsyncAll(coros, timeout=None):
+        """Run coroutines concurrently on the shared harness event loop. Returns list of results in order."""
+        async def gatherAll():
+            return await asyncio.gather(*coros)
+        return Utils.runAsync(gatherAll(), timeout)
+
+    @staticmethod
+    def registerForkReset(obj):
+        """Have obj.resetAfterFork() called in every forked child, for objects holding threads, locks or connections."""
+        Utils.__forkResets.add(obj)
+
+    @staticmethod
+    def resetAfterFork():
+        """Threads do not survive fork, and locks they held stay locked in the child. A forked child (e.g. a load
+        shard) starts its own harness event loop on first use, and registered objects drop their connections and
+        follower threads."""
+        Utils.__asyncLoop=None
+        Utils.__asyncLoopLock=threading.Lock()
+        for obj in list(Utils.__forkResets):
+            obj.resetAfterFork()
+
+os.register_at_fork(after_in_child=Utils.resetAfterFork)
+
+###########################################################################################
+class RpcError(Exception):
+    """HTTP API failure. status is None when the server could not be reached."""
+
+    def __init__(self, msg, status=None, response=None):
+        super().__init__(msg)
+        self.status=status
+        self.response=response
+
+class RpcUnsupportedError(RpcError):
+    """Endpoint is not exposed by the server (plugin not loaded)."""
+    pass
+
+class HttpClient(object):
+    """JSON client for the nod/kd HTTP API. Keeps a pool of keep-alive connections so that concurrent callers
+    never share a socket and no call pays for a new TCP handshake."""
+
+    __headers={"Content-Type": "application/json", "Connection": "keep-alive"}
+
+    def __init__(self, host, port, maxConnections=32, timeout=30):
+        self.host=host
+        self.port=port
+        self.maxConnections=maxConnections
+        self.timeout=timeout
+        self.unsupported=set()
+        self.__idle=[]
+        self.__lock=threading.Lock()
+        Utils.registerForkReset(self)
+
+    def __str__(self):
+        return "http://%s:%d" % (self.host, self.port)
+
+    def resetAfterFork(self):
+        # idle sockets are shared with the parent, the child opens its own
+        self.__idle=[]
+        self.__lock=threading.Lock()
+
+    def __acquire(self):
+        with self.__lock:
+            if self.__idle:
+                return (self.__idle.pop(), True)
+        return (http.client.HTTPConnection(self.host, self.port, timeout=self.timeout), False)
+
+    def __release(self, conn):
+        with self.__lock:
+            if len(self.__idle) < self.maxConnections:
+                self.__idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self.__lock:
+            idle=self.__idle
+            self.__idle=[]
+        for conn in idle:
+            conn.close()
+
+    @staticmethod
+    def formatError(status, payload):
+        """Flatten the http_plugin error object into a single line message."""
+        try:
+            err=json.loads(payload.decode("utf-8"))
+            error=err["error"]
+            details=" ".join(d["message"] for d in error.get("details", []))
+            return "%d %s: %s %s" % (status, err.get("message", ""), error.get("what", error.get("name", "")), details)
+        except (ValueError, TypeError, KeyError, AttributeError) as _:
+            return "%d %s" % (status, payload[:1024])
+
+    def postRaw(self, path, body=None):
+        """POST body (bytes, str or json serializable object) to path. Returns raw response body (bytes)."""
+        if body is None:
+            data=b""
+        elif isinstance(body, bytes):
+            data=body
+        elif isinstance(body, str):
+            data=body.encode("utf-8")
+        else:
+            data=json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+        while True:
+            conn,reused=self.__acquire()
+            try:
+                conn.request("POST", path, body=data, headers=HttpClient.__headers)
+                resp=conn.getresponse()
+                payload=resp.read()
+            except (http.client.HTTPException, OSError) as ex:
+                conn.close()
+                if reused:
+                    continue # stale keep-alive connection, the server closed it while idle
+                raise RpcError("Failed to connect to %s%s. %s" % (self, path, ex))
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self.__release(conn)
+            break
+
+        if resp.status == 404:
+            self.unsupported.add(path)
+            raise RpcUnsupportedError("Endpoint %s%s not supported." % (self, path), resp.status, payload)
+        if resp.status < 200 or resp.status >= 300:
+            raise RpcError(HttpClient.formatError(resp.status, payload), resp.status, payload)
+        return payload
+
+    def post(self, path, body=None):
+        """POST body to path and return the decoded json response."""
+        payload=self.postRaw(path, body)
+        return JsonDecoder.loads(payload)
+
+    def supports(self, path):
+        return path not in self.unsupported
+
+    @staticmethod
+    def parseUrl(args):
+        """Extract (host, port) from a "--wallet-url http://host:port" style argument string. Returns None if absent."""
+        m=re.search(r"--wallet-url\s+https?://([^:/\s]+):(\d+)", args)
+        if m is None:
+            return None
+        return (m.group(1), int(m.group(2)))
+
+
+class AsyncHttpClient(object):
+    """asyncio counterpart of HttpClient. Bounds the number of in-flight requests and keeps idle keep-alive
+    connections for reuse. Connections belong to the event loop that opened them."""
+
+    def __init__(self, host, port, maxInFlight=16, timeout=30):
+        self.host=host
+        self.port=port
+        self.maxInFlight=maxInFlight
+        self.timeout=timeout
+        self.unsupported=set()
+        self.__loop=None
+        self.__idle=[]
+        self.__semaphore=None
+        Utils.registerForkReset(self)
+
+    def __str__(self):
+        return "http://%s:%d" % (self.host, self.port)
+
+    def resetAfterFork(self):
+        # the parent's loop and its connections are unusable in the child
+        self.__loop=None
+        self.__idle=[]
+        self.__semaphore=None
+
+    def __bindLoop(self):
+        loop=asyncio.get_running_loop()
+        if self.__loop is not loop:
+            self.__loop=loop
+            self.__idle=[]
+            self.__semaphore=asyncio.Semaphore(self.maxInFlight)
+
+    @staticmethod
+    async def __readResponse(reader):
+        statusLine=await reader.readline()
+        if not statusLine:
+            raise ConnectionResetError("connection closed by server")
+        status=int(statusLine.split()[1])
+        headers={}
+        while True:
+            line=await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key,_,value=line.decode("latin-1").partition(":")
+            headers[key.strip().lower()]=value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks=[]
+            while True:
+                size=int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            payload=b"".join(chunks)
+        elif "content-length" in headers:
+            payload=await reader.readexactly(int(headers["content-length"]))
+        else:
+            payload=await reader.read()
+            headers["connection"]="close"
+
+        keepAlive=headers.get("connection", "").lower() != "close"
+        return (status, payload, keepAlive)
+
+    async def postRaw(self, path, body=None):
+        """POST body (bytes, str or json serializable object) to path. Returns raw response body (bytes)."""
+        self.__bindLoop()
+        if body is None:
+            data=b""
+        elif isinstance(body, bytes):
+            data=body
+        elif isinstance(body, str):
+            data=body.encode("utf-8")
+        else:
+            data=json.dumps(body, separators=(",", ":")).encode("utf-8")
+        request=("POST %s HTTP/1.1\r\nHost: %s:%d\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n" % (
+            path, self.host, self.port, len(data))).encode("latin-1") + data
+
+        async with self.__semaphore:
+            while True:
+                reused=len(self.__idle) > 0
+                writer=None
+                try:
+                    if reused:
+                        reader,writer=self.__idle.pop()
+                    else:
+                        reader,writer=await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+                    writer.write(request)
+                    status,payload,keepAlive=await asyncio.wait_for(AsyncHttpClient.__readResponse(reader), self.timeout)
+                except BaseException as ex: # includes cancellation, the connection must not leak either way
+                    if writer is not None:
+                        writer.close()
+                    if not isinstance(ex, (OSError, ValueError, IndexError, asyncio.IncompleteReadError, asyncio.TimeoutError)):
+                        raise
+                    if reused:
+                        continue # stale keep-alive connection
+                    raise RpcError("Failed to connect to %s%s. %s" % (self, path, ex))
+                break
+
+            if keepAlive:
+                self.__idle.append((reader, writer))
+            else:
+                writer.close()
+
+        if status == 404:
+            self.unsupported.add(path)
+            raise RpcUnsupportedError("Endpoint %s%s not supported." % (self, path), status, payload)
+        if status < 200 or status >= 300:
+            raise RpcError(HttpClient.formatError(status, payload), status, payload)
+        return payload
+
+    async def post(self, path, body=None):
+        """POST body to path and return the decoded json response."""
+        payload=await self.postRaw(path, body)
+        return JsonDecoder.loads(payload)
+
 
 ###########################################################################################
 class Account(object):
@@ -153,6 +486,12 @@ class Node(object):
         self.mongoEndpointArgs=""
         if self.enableMongo:
             self.mongoEndpointArgs += "--host %s --port %d %s" % (mongoHost, mongoPort, mongoDb)
+        self.rpc=HttpClient(self.host, self.port) if Utils.UseHttp else None
+        self.walletRpc=self.rpc # wallet_api_plugin loaded into nod unless a --wallet-url is set
+        self.__asyncNode=None
+        self.__blockFollower=None
+        self.blockArchive=None # BlockArchive every fetched block is stored into, see setBlockArchive
+        self.archiveLib=0 # last irreversible block number as of the last check, archived blocks up to it are reused
 
     def __str__(self):
         #return "Host: %s, Port:%d, Pid:%s, Cmd:\"%s\"" % (self.host, self.port, self.pid, self.cmd)
@@ -172,32 +511,33 @@ class Node(object):
     @staticmethod
     def runCmdReturnJson(cmd, trace=False):
         cmdArr=shlex.split(cmd)
-        retStr=Utils.checkOutput(cmdArr)
-        jStr=Node.filterJsonObject(retStr)
-        if trace: Utils.Print ("RAW > %s"% (retStr))
-        if trace: Utils.Print ("JSON> %s"% (jStr))
-        if not jStr:
+        # parsed from the output bytes, only decoded to str for printing
+        retBytes=subprocess.check_output(cmdArr)
+        jBytes=JsonDecoder.embedded(retBytes)
+        if trace: Utils.Print ("RAW > %s"% (Node.byteArrToStr(retBytes)))
+        if trace: Utils.Print ("JSON> %s"% (Node.byteArrToStr(jBytes)))
+        if not jBytes:
             msg="Expected JSON response"
             Utils.Print ("ERROR: "+ msg)
-            Utils.Print ("RAW > %s"% retStr)
+            Utils.Print ("RAW > %s"% Node.byteArrToStr(retBytes))
             raise TypeError(msg)
 
         try:
-            jsonData=json.loads(jStr)
+            jsonData=JsonDecoder.loads(jBytes)
             return jsonData
-        except json.decoder.JSONDecodeError as ex:
+        except ValueError as ex:
             Utils.Print (ex)
-            Utils.Print ("RAW > %s"% retStr)
-            Utils.Print ("JSON> %s"% jStr)
+            Utils.Print ("RAW > %s"% Node.byteArrToStr(retBytes))
+            Utils.Print ("JSON> %s"% Node.byteArrToStr(jBytes))
             raise
 
     @staticmethod
     def __runCmdArrReturnJson(cmdArr, trace=False):
-        retStr=Utils.checkOutput(cmdArr)
-        jStr=Node.filterJsonObject(retStr)
-        if trace: Utils.Print ("RAW > %s"% (retStr))
-        if trace: Utils.Print ("JSON> %s"% (jStr))
-        jsonData=json.loads(jStr)
+        retBytes=subprocess.check_output(cmdArr)
+        jBytes=JsonDecoder.embedded(retBytes)
+        if trace: Utils.Print ("RAW > %s"% (Node.byteArrToStr(retBytes)))
+        if trace: Utils.Print ("JSON> %s"% (Node.byteArrToStr(jBytes)))
+        jsonData=JsonDecoder.loads(jBytes)
         return jsonData
 
     @staticmethod
@@ -206,13 +546,6 @@ class Node(object):
         if trace: Utils.Print ("RAW > %s"% (retStr))
         return retStr
 
-    @staticmethod
-    def filterJsonObject(data):
-        firstIdx=data.find('{')
-        lastIdx=data.rfind('}')
-        retStr=data[firstIdx:lastIdx+1]
-        return retStr
-
     @staticmethod
     def __checkOutput(cmd):
         retStr=subprocess.check_output(cmd, stderr=subprocess.STDOUT).decode("utf-8")
@@ -236,30 +569,20 @@ class Node(object):
 
         return (ret, outs, errs)
 
-    @staticmethod
-    def normalizeJsonObject(extJStr):
-        tmpStr=extJStr
-        tmpStr=re.sub(r'ObjectId\("(\w+)"\)', r'"ObjectId-\1"', tmpStr)
-        tmpStr=re.sub(r'ISODate\("([\w|\-|\:|\.]+)"\)', r'"ISODate-\1"', tmpStr)
-        return tmpStr
-
     @staticmethod
     def runMongoCmdReturnJson(cmdArr, subcommand, trace=False):
-        retId,outs=Node.stdinAndCheckOutput(cmdArr, subcommand)
+        retId,outs,_=Node.stdinAndCheckOutput(cmdArr, subcommand)
         if retId is not 0:
             return None
-        outStr=Node.byteArrToStr(outs)
-        if not outStr:
-            return None
-        extJStr=Node.filterJsonObject(outStr)
-        if not extJStr:
+        if not outs:
             return None
-        jStr=Node.normalizeJsonObject(extJStr)
-        if not jStr:
+        extJBytes=JsonDecoder.embedded(outs)
+        if not extJBytes:
             return None
-        if trace: Utils.Print ("RAW > %s"% (outStr))
-        #trace and Utils.Print ("JSON> %s"% jStr)
-        jsonData=json.loads(jStr)
+        jBytes=JsonDecoder.normalizeMongo(extJBytes)
+        if trace: Utils.Print ("RAW > %s"% (Node.byteArrToStr(outs)))
+        #trace and Utils.Print ("JSON> %s"% jBytes)
+        jsonData=JsonDecoder.loads(jBytes)
         return jsonData
 
     @staticmethod
@@ -274,10 +597,272 @@ class Node(object):
 
     @staticmethod
     def byteArrToStr(arr):
-        return arr.decode("utf-8")
+        return bytes(arr).decode("utf-8")
 
     def setWalletEndpointArgs(self, args):
         self.endpointArgs="--url http://%s:%d %s" % (self.host, self.port, args)
+        if self.rpc is not None:
+            walletUrl=HttpClient.parseUrl(args)
+            self.walletRpc=self.rpc if walletUrl is None else HttpClient(walletUrl[0], walletUrl[1])
+
+    def asyncNode(self):
+        """Returns the AsyncNode bound to this node's HTTP endpoint (created on first use)."""
+        if self.__asyncNode is None:
+            self.__asyncNode=AsyncNode(self.host, self.port)
+        return self.__asyncNode
+
+    def setBlockArchive(self, archive):
+        """Persist every block fetched from this node (getBlock, iterBlocks, block following) into archive
+        (block_archive.BlockArchive), None to stop. getBlock and iterBlocks serve irreversible blocks, and blocks
+        requested by id, from the archive when it has them."""
+        self.blockArchive=archive
+        self.archiveLib=0
+
+    def archivedBlock(self, blockNum, refresh=True):
+        """Returns block json object for blockNum (number or id string) from the block archive, None if it is not
+        archived or, for a number, is above the last irreversible block. refresh: re-read the last irreversible block
+        number from the node when blockNum is above the one last seen."""
+        if self.blockArchive is None:
+            return None
+        blockNum=str(blockNum)
+        if len(blockNum) == 64:
+            return self.blockArchive.getById(blockNum)
+        num=int(blockNum)
+        if num > self.archiveLib:
+            if not refresh or not self.blockArchive.has(num):
+                return None
+            lib=self.getIrreversibleBlockNum()
+            if lib is not None:
+                self.archiveLib=max(self.archiveLib, int(lib))
+            if num > self.archiveLib:
+                return None
+        return self.blockArchive.get(num)
+
+    def archiveBlock(self, block):
+        if self.blockArchive is not None and block is not None and "block_num" in block:
+            self.blockArchive.put(block)
+
+    def blockFollower(self):
+        """Returns the BlockFollower indexing this node's transactions (created on first use)."""
+        if self.__blockFollower is None:
+            self.__blockFollower=BlockFollower(self)
+        return self.__blockFollower
+
+    def rpcEnabled(self, path):
+        """True if path should be requested over HTTP rather than through cl."""
+        return self.rpc is not None and self.rpc.supports(path)
+
+    def rpcCall(self, path, params=None, trace=False):
+        """POST params to nod endpoint path. Returns json object. Raises RpcError."""
+        if Utils.Debug: Utils.Print("rpc: %s%s %s" % (self.rpc, path, "" if params is None else json.dumps(params)))
+        jsonData=self.rpc.post(path, params)
+        if trace: Utils.Print ("JSON> %s"% (jsonData))
+        return jsonData
+
+    def rpcPushEnabled(self):
+        """True if transactions can be signed and pushed over HTTP."""
+        return (self.rpcEnabled("/v1/chain/push_transaction") and
+                self.walletRpc.supports("/v1/wallet/sign_transaction") and self.walletRpc.supports("/v1/wallet/get_public_keys"))
+
+    def walletRpcCall(self, path, params=None):
+        """POST params to wallet endpoint path. Returns json object. Raises RpcError."""
+        if Utils.Debug: Utils.Print("rpc: %s%s" % (self.walletRpc, path))
+        return self.walletRpc.post(path, params)
+
+    @staticmethod
+    def parsePermissionOpts(opts):
+        """Parse cl "--permission actor@perm" options into an authorization list. Returns None if opts holds
+        anything the HTTP push path does not implement."""
+        if opts is None:
+            return None
+        auths=[]
+        optsArr=opts.split()
+        i=0
+        while i < len(optsArr):
+            if optsArr[i] not in ("-p", "--permission") or i+1 >= len(optsArr):
+                return None
+            for perm in optsArr[i+1].split(","):
+                actor,_,permission=perm.partition("@")
+                auths.append({"actor": actor, "permission": permission if permission else "active"})
+            i += 2
+        return auths if len(auths) > 0 else None
+
+    @staticmethod
+    def blockTimeToDatetime(timeStr):
+        """Convert chain time string of form "2018-05-01T12:00:00.500" to datetime."""
+        return datetime.datetime.strptime(timeStr.split(".")[0], "%Y-%m-%dT%H:%M:%S")
+
+    @staticmethod
+    def newTransaction(actions, info, expiration=30):
+        """Returns an unsigned transaction json object referencing the head block in info (get info object)."""
+        headBlockId=info["head_block_id"]
+        refBlockNum=int(headBlockId[0:8], 16) & 0xffff
+        refBlockPrefix=int.from_bytes(bytes.fromhex(headBlockId[16:24]), "little")
+        expirationTime=Node.blockTimeToDatetime(info["head_block_time"]) + datetime.timedelta(seconds=expiration)
+        trx={
+            "expiration": expirationTime.strftime("%Y-%m-%dT%H:%M:%S"),
+            "ref_block_num": refBlockNum,
+            "ref_block_prefix": refBlockPrefix,
+            "max_net_usage_words": 0,
+            "max_cpu_usage_ms": 0,
+            "delay_sec": 0,
+            "context_free_actions": [],
+            "actions": actions,
+            "transaction_extensions": [],
+            "signatures": [],
+            "context_free_data": []
+        }
+        return trx
+
+    @staticmethod
+    def nameToInt(name):
+        """Encode account/action name string into its uint64 representation."""
+        def charToSymbol(c):
+            if "a" <= c <= "z":
+                return ord(c) - ord("a") + 6
+            if "1" <= c <= "5":
+                return ord(c) - ord("1") + 1
+            return 0
+
+        value=0
+        for i,c in enumerate(name[:13]):
+            sym=charToSymbol(c)
+            if i < 12:
+                value |= (sym & 0x1f) << (64 - 5*(i+1))
+            else:
+                value |= sym & 0x0f
+        return value
+
+    @staticmethod
+    def packVarUint32(value):
+        out=bytearray()
+        while True:
+            b=value & 0x7f
+            value >>= 7
+            out.append(b | (0x80 if value else 0))
+            if not value:
+                return bytes(out)
+
+    @staticmethod
+    def packAsset(assetStr):
+        """Pack asset string of form "12.3456 SYS" (int64 amount, uint64 symbol)."""
+        amountStr,symbolName=assetStr.split()
+        precision=len(amountStr.split(".")[1]) if "." in amountStr else 0
+        amount=int(amountStr.replace(".", ""))
+        symbol=precision
+        for i,c in enumerate(symbolName):
+            symbol |= ord(c) << (8*(i+1))
+        return struct.pack("<qQ", amount, symbol)
+
+    @staticmethod
+    def packTransferData(data):
+        """Pack io.token transfer action data locally (saves an abi_json_to_bin round trip per transfer). Returns hex string."""
+        memo=data["memo"].encode("utf-8")
+        packed=struct.pack("<QQ", Node.nameToInt(data["from"]), Node.nameToInt(data["to"]))
+        packed += Node.packAsset(data["quantity"]) + Node.packVarUint32(len(memo)) + memo
+        return packed.hex()
+
+    def packActionData(self, action):
+        """Replace json object action data by its abi packed hex string."""
+        data=action["data"]
+        if isinstance(data, str):
+            return action
+        action=dict(action)
+        if action["account"] == "io.token" and action["name"] == "transfer" and sorted(data) == ["from", "memo", "quantity", "to"]:
+            action["data"]=Node.packTransferData(data)
+            return action
+        packed=self.rpcCall("/v1/chain/abi_json_to_bin", {"code": action["account"], "action": action["name"], "args": data})
+        action["data"]=packed["binargs"]
+        return action
+
+    def signTransaction(self, trx, chainId, availableKeys=None):
+        """Sign trx with the keys it requires from the unlocked wallets. Returns signed transaction json object."""
+        if availableKeys is None:
+            availableKeys=self.walletRpcCall("/v1/wallet/get_public_keys")
+        required=self.rpcCall("/v1/chain/get_required_keys", {"transaction": trx, "available_keys": availableKeys})
+        return self.walletRpcCall("/v1/wallet/sign_transaction", [trx, required["required_keys"], chainId])
+
+    @staticmethod
+    def packedTransaction(signedTrx):
+        """Wrap a signed transaction in the packed_transaction form accepted by push_transaction."""
+        trx=dict(signedTrx)
+        signatures=trx.pop("signatures")
+        trx.pop("context_free_data", None)
+        return {"signatures": signatures, "compression": "none", "packed_context_free_data": "", "transaction": trx}
+
+    def pushTransaction(self, actions, expiration=30):
+        """Pack, sign (through the wallet) and push a transaction made of actions. Action data may be a json object
+        or a packed hex string. Returns push transaction json object. Raises RpcError."""
+        info=self.rpcCall("/v1/chain/get_info")
+        actions=[self.packActionData(action) for action in actions]
+        trx=Node.newTransaction(actions, info, expiration)
+        signedTrx=self.signTransaction(trx, info["chain_id"])
+        return self.rpcCall("/v1/chain/push_transaction", Node.packedTransaction(signedTrx))
+
+    # pylint: disable=too-many-locals
+    def signTransactions(self, batch, expiration=30, signThreads=8):
+        """Pack and sign a batch of transactions, each given as a list of actions. Identical entries produce identical
+        transaction ids (and all but one get rejected), vary e.g. the memo. Returns list, in batch order, of
+        (True, packed transaction json object) or (False, error message)."""
+        assert(isinstance(batch, list))
+        info=self.rpcCall("/v1/chain/get_info")
+        chainId=info["chain_id"]
+        availableKeys=self.walletRpcCall("/v1/wallet/get_public_keys")
+        requiredKeys={} # required keys depend only on the authorizations
+        lock=threading.Lock()
+
+        def sign(actions):
+            try:
+                actions=[self.packActionData(action) for action in actions]
+                trx=Node.newTransaction(actions, info, expiration)
+                auths=tuple(sorted((auth["actor"], auth["permission"]) for action in actions for auth in action["authorization"]))
+                with lock:
+                    keys=requiredKeys.get(auths)
+                if keys is None:
+                    keys=self.rpcCall("/v1/chain/get_required_keys", {"transaction": trx, "available_keys": availableKeys})["required_keys"]
+                    with lock:
+                        requiredKeys[auths]=keys
+                signedTrx=self.walletRpcCall("/v1/wallet/sign_transaction", [trx, keys, chainId])
+                return (True, Node.packedTransaction(signedTrx))
+            except RpcError as ex:
+                return (False, str(ex))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=signThreads) as executor:
+            return list(executor.map(sign, batch))
+
+    def pushPackedTransactions(self, packedTrxs, chunkSize=1000):
+        """Push signed transactions through chain push_transactions, up to chunkSize (nod caps it at 1000) per request.
+        Returns list, in order, of (True, push transaction json object) or (False, error message)."""
+        assert(chunkSize <= 1000)
+        results=[]
+        for i in range(0, len(packedTrxs), chunkSize):
+            chunk=packedTrxs[i:i+chunkSize]
+            try:
+                responses=self.rpcCall("/v1/chain/push_transactions", chunk)
+            except RpcError as ex:
+                results += [(False, str(ex))]*len(chunk)
+                continue
+
+            for response in responses:
+                processed=response.get("processed")
+                if isinstance(processed, dict) and "error" in processed:
+                    results.append((False, processed["error"]))
+                else:
+                    results.append((True, response))
+        return results
+
+    def pushTransactions(self, batch, expiration=30, chunkSize=1000):
+        """Pack, sign and submit a batch of transactions (each a list of actions, see pushTransaction) with as few
+        round trips as nod allows. Returns list, in batch order, of (True, push transaction json object) or
+        (False, error message)."""
+        signed=self.signTransactions(batch, expiration)
+        results=list(signed)
+        toPush=[idx for idx,(ok,_) in enumerate(signed) if ok]
+        pushed=self.pushPackedTransactions([signed[idx][1] for idx in toPush], chunkSize)
+        for idx,result in zip(toPush, pushed):
+            results[idx]=result
+        if Utils.Debug: Utils.Print("pushTransactions: %d of %d accepted" % (sum(1 for ok,_ in results if ok), len(results)))
+        return results
 
     def validateAccounts(self, accounts):
         assert(accounts)
@@ -296,10 +881,76 @@ class Node(object):
                 raise
 
     # pylint: disable=too-many-branches
+    def iterBlocks(self, start, end=None, window=16, fields=None, silentErrors=False):
+        """Generator of (block number, block json object or None if unavailable) for blocks start..end inclusive (end
+        defaults to the head block), in order. Up to window blocks are requested ahead (concurrently over HTTP, from a
+        thread pool otherwise), so memory stays bounded whatever the range. fields: top level block fields to keep,
+        the whole block if None."""
+        assert(isinstance(start, int))
+        if end is None:
+            end=self.getHeadBlockNum()
+            if end is None:
+                return
+        assert(window > 0)
+        useAsync=not self.enableMongo and self.rpcEnabled("/v1/chain/get_block")
+        executor=None if useAsync else concurrent.futures.ThreadPoolExecutor(max_workers=window)
+        if self.blockArchive is not None:
+            # archived blocks up to the last irreversible block are served without a request
+            lib=self.getIrreversibleBlockNum()
+            if lib is not None:
+                self.archiveLib=max(self.archiveLib, int(lib))
+
+        def request(blockNum):
+            block=self.archivedBlock(blockNum, refresh=False)
+            if block is not None:
+                future=concurrent.futures.Future()
+                future.set_result(block)
+                return future
+            if useAsync:
+                return Utils.submitAsync(self.asyncNode().getBlock(str(blockNum), silentErrors))
+            return executor.submit(self.__getBlock, str(blockNum), False, silentErrors)
+
+        pending=deque()
+        nextBlockNum=start
+        try:
+            while nextBlockNum <= end or len(pending) > 0:
+                while nextBlockNum <= end and len(pending) < window:
+                    pending.append((nextBlockNum, request(nextBlockNum)))
+                    nextBlockNum += 1
+                blockNum,future=pending.popleft()
+                block=future.result()
+                self.archiveBlock(block)
+                if block is not None and fields is not None:
+                    block={field: block[field] for field in fields if field in block}
+                yield (blockNum, block)
+        finally:
+            for _,future in pending:
+                future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
+
     def getBlock(self, blockNum, retry=True, silentErrors=False):
         """Given a blockId will return block details."""
+        block=self.archivedBlock(blockNum)
+        if block is not None:
+            return block
+        block=self.__getBlock(blockNum, retry, silentErrors)
+        self.archiveBlock(block)
+        return block
+
+    def __getBlock(self, blockNum, retry=True, silentErrors=False):
         assert(isinstance(blockNum, str))
         if not self.enableMongo:
+            if self.rpcEnabled("/v1/chain/get_block"):
+                try:
+                    return self.rpcCall("/v1/chain/get_block", {"block_num_or_id": blockNum})
+                except RpcUnsupportedError as _:
+                    pass
+                except RpcError as ex:
+                    if not silentErrors:
+                        Utils.Print("ERROR: Exception during get block. %s" % (ex))
+                    return None
+
             cmd="%s %s get block %s" % (Utils.ClientPath, self.endpointArgs, blockNum)
             if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
             try:
@@ -360,18 +1011,37 @@ class Node(object):
 
         info=self.getInfo(silentErrors=True)
         assert(info)
-        last_irreversible_block_num=0
+        return Node.infoHasBlockNum(info, blockNum)
+
+    @staticmethod
+    def infoHasBlockNum(info, blockNum):
+        """Evaluate doesNodeHaveBlockNum against a get info json object: the node has every block up to its head."""
+        head_block_num=0
         try:
-            last_irreversible_block_num=int(info["last_irreversible_block_num"])
+            head_block_num=int(info["head_block_num"])
         except (TypeError, KeyError) as _:
             Utils.Print("Failure in get info parsing. %s" % (info))
             raise
 
-        return True if blockNum <= last_irreversible_block_num else True
+        return blockNum <= head_block_num
 
     # pylint: disable=too-many-branches
     def getTransaction(self, transId, retry=True, silentErrors=False):
         if not self.enableMongo:
+            if self.rpcEnabled("/v1/history/get_transaction"):
+                try:
+                    # account_history_plugin reads get_transaction_params.transaction_id
+                    return self.rpcCall("/v1/history/get_transaction", {"transaction_id": transId})
+                except RpcUnsupportedError as _:
+                    pass
+                except RpcError as ex:
+                    if ex.status is None:
+                        Utils.Print("ERROR: Node is unreachable. %s" % (ex))
+                        raise
+                    if not silentErrors:
+                        Utils.Print("ERROR: Exception during transaction retrieval. %s" % (ex))
+                    return None
+
             cmd="%s %s get transaction %s" % (Utils.ClientPath, self.endpointArgs, transId)
             if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
             try:
@@ -413,7 +1083,21 @@ class Node(object):
         assert(blockId)
         assert(isinstance(blockId, str))
 
-        block=self.getBlock(blockId)
+        if self.blockArchive is None and not self.enableMongo and self.rpcEnabled("/v1/chain/get_block"):
+            # the id is in the raw response if the block has it, most blocks are rejected without being parsed
+            try:
+                payload=self.rpc.postRaw("/v1/chain/get_block", {"block_num_or_id": blockId})
+                if transId.encode("utf-8") not in payload:
+                    return False
+                block=JsonDecoder.project(JsonDecoder.loads(payload), [["transactions", "*", "trx", "id"]])
+                block["transactions"]=[trans for trans in block.get("transactions", []) if trans]
+            except RpcUnsupportedError as _:
+                block=self.getBlock(blockId)
+            except RpcError as ex:
+                Utils.Print("ERROR: Exception during get block. %s" % (ex))
+                block=None
+        else:
+            block=self.getBlock(blockId)
         transactions=None
         try:
             transactions=block["transactions"]
@@ -437,6 +1121,11 @@ class Node(object):
         """Given a transaction Id (string), will return block id (string) containing the transaction"""
         assert(transId)
         assert(isinstance(transId, str))
+        if not self.enableMongo:
+            blockNum=self.blockFollower().find(transId)
+            if blockNum is not None:
+                return str(blockNum)
+
         trans=self.getTransaction(transId)
         assert(trans)
 
@@ -455,6 +1144,12 @@ class Node(object):
         except(ValueError) as _:
             Utils.Print("Info parsing failed. %s" % (headBlockNum))
 
+        if not self.enableMongo:
+            # ref_block_num only holds the low 16 bits of the reference block number
+            refBlockNum=headBlockNum - ((headBlockNum - refBlockNum) & 0xffff)
+            blockNum=self.blockFollower().lookup(transId, max(refBlockNum, 1), headBlockNum)
+            return None if blockNum is None else str(blockNum)
+
         for blockNum in range(refBlockNum, headBlockNum+1):
             if self.isTransInBlock(str(transId), str(blockNum)):
                 return str(blockNum)
@@ -591,6 +1286,15 @@ class Node(object):
 
     def getAccount(self, name):
         assert(isinstance(name, str))
+        if self.rpcEnabled("/v1/chain/get_account"):
+            try:
+                return self.rpcCall("/v1/chain/get_account", {"account_name": name})
+            except RpcUnsupportedError as _:
+                pass
+            except RpcError as ex:
+                Utils.Print("ERROR: Exception during get account. %s" % (ex))
+                return None
+
         cmd="%s %s get account -j %s" % (Utils.ClientPath, self.endpointArgs, name)
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
         try:
@@ -614,6 +1318,15 @@ class Node(object):
             return None
 
     def getTable(self, contract, scope, table):
+        if self.rpcEnabled("/v1/chain/get_table_rows"):
+            try:
+                return self.rpcCall("/v1/chain/get_table_rows", {"json": True, "code": contract, "scope": scope, "table": table})
+            except RpcUnsupportedError as _:
+                pass
+            except RpcError as ex:
+                Utils.Print("ERROR: Exception during table retrieval. %s" % (ex))
+                return None
+
         cmd="%s %s get table %s %s %s" % (Utils.ClientPath, self.endpointArgs, contract, scope, table)
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
         try:
@@ -644,6 +1357,16 @@ class Node(object):
         assert(isinstance(account, str))
         assert(symbol)
         assert(isinstance(symbol, str))
+        if self.rpcEnabled("/v1/chain/get_currency_balance"):
+            try:
+                balances=self.rpcCall("/v1/chain/get_currency_balance", {"code": contract, "account": account, "symbol": symbol})
+                return "".join("%s\n" % (balance) for balance in balances) # same layout as cl output
+            except RpcUnsupportedError as _:
+                pass
+            except RpcError as ex:
+                Utils.Print("ERROR: Exception during get currency stats. %s" % (ex))
+                return None
+
         cmd="%s %s get currency balance %s %s %s" % (Utils.ClientPath, self.endpointArgs, contract, account, symbol)
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
         try:
@@ -660,6 +1383,15 @@ class Node(object):
         assert(isinstance(contract, str))
         assert(symbol)
         assert(isinstance(symbol, str))
+        if self.rpcEnabled("/v1/chain/get_currency_stats"):
+            try:
+                return self.rpcCall("/v1/chain/get_currency_stats", {"code": contract, "symbol": symbol})
+            except RpcUnsupportedError as _:
+                pass
+            except RpcError as ex:
+                Utils.Print("ERROR: Exception during get currency stats. %s" % (ex))
+                return None
+
         cmd="%s %s get currency stats %s %s" % (Utils.ClientPath, self.endpointArgs, contract, symbol)
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
         try:
@@ -695,18 +1427,39 @@ class Node(object):
 
         return None
 
+    def useBlockFollower(self):
+        """Waits are served by the background BlockFollower (woken at block cadence) rather than sleep polling."""
+        return Utils.UseHttp and not self.enableMongo and not self.killed
+
     def waitForBlockNumOnNode(self, blockNum, timeout=None):
+        if self.useBlockFollower():
+            assert isinstance(blockNum, int)
+            assert (blockNum > 0)
+            lam = lambda follower: follower.info is not None and Node.infoHasBlockNum(follower.info, blockNum)
+            return True if self.blockFollower().waitFor(lam, timeout) else False
+
         lam = lambda: self.doesNodeHaveBlockNum(blockNum)
         ret=Utils.waitForBool(lam, timeout)
         return ret
 
     def waitForTransIdOnNode(self, transId, timeout=None):
+        if self.useBlockFollower():
+            # the first lookup positions the follower window at the transaction reference block
+            if self.doesNodeHaveTransId(transId):
+                return True
+            lam = lambda follower: follower.find(transId) is not None
+            return True if self.blockFollower().waitFor(lam, timeout) else False
+
         lam = lambda: self.doesNodeHaveTransId(transId)
         ret=Utils.waitForBool(lam, timeout)
         return ret
 
     def waitForNextBlock(self, timeout=None):
         num=self.getHeadBlockNum()
+        if self.useBlockFollower():
+            lam = lambda follower: follower.headBlockNum() is not None and follower.headBlockNum() > num
+            return True if self.blockFollower().waitFor(lam, timeout) else False
+
         lam = lambda: self.getHeadBlockNum() > num
         ret=Utils.waitForBool(lam, timeout)
         return ret
@@ -719,6 +1472,27 @@ class Node(object):
         assert(destination)
         assert(isinstance(destination, Account))
 
+        # force (unique nonce action) is only implemented by cl
+        if not force and self.rpcPushEnabled():
+            action={"account": "io.token", "name": "transfer",
+                    "authorization": [{"actor": source.name, "permission": "active"}],
+                    "data": {"from": source.name, "to": destination.name, "quantity": amountStr, "memo": memo}}
+            if Utils.Debug: Utils.Print("rpc transfer: %s" % (action))
+            trans=None
+            try:
+                trans=self.pushTransaction([action])
+            except RpcUnsupportedError as _:
+                pass
+            except RpcError as ex:
+                Utils.Print("ERROR: Exception during funds transfer. %s" % (ex))
+                return None
+
+            if trans is not None:
+                transId=Node.getTransId(trans)
+                if waitForTransBlock and not self.waitForTransIdOnNode(transId):
+                    return None
+                return trans
+
         cmd="%s %s -v transfer -j %s %s" % (
             Utils.ClientPath, self.endpointArgs, source.name, destination.name)
         cmdArr=cmd.split()
@@ -762,8 +1536,9 @@ class Node(object):
 
         return balanceStr
 
-    def validateFunds(self, initialBalances, transferAmount, source, accounts):
-        """Validate each account has the expected SYS balance. Validate cumulative balance matches expectedTotal."""
+    def validateFunds(self, initialBalances, transferAmount, source, accounts, currentBalances=None):
+        """Validate each account has the expected SYS balance. Validate cumulative balance matches expectedTotal.
+        currentBalances: balances already fetched from this node (see Cluster.getBalanceSnapshots), queried if None."""
         assert(source)
         assert(isinstance(source, Account))
         assert(accounts)
@@ -773,11 +1548,17 @@ class Node(object):
         assert(isinstance(initialBalances, dict))
         assert(isinstance(transferAmount, int))
 
-        currentBalances=self.getBalances([source] + accounts)
+        if currentBalances is None:
+            currentBalances=self.getBalances([source] + accounts)
         assert(currentBalances)
         assert(isinstance(currentBalances, dict))
         assert(len(initialBalances) == len(currentBalances))
 
+        missing=[key.name for key,value in currentBalances.items() if value is None]
+        if len(missing) > 0:
+            Utils.Print("ERROR: validateFunds> Failed to retrieve balances of account(s) %s" % (", ".join(missing)))
+            return False
+
         if len(currentBalances) != len(initialBalances):
             Utils.Print("ERROR: validateFunds> accounts length mismatch. Initial: %d, current: %d" % (len(initialBalances), len(currentBalances)))
             return False
@@ -806,8 +1587,43 @@ class Node(object):
 
         return balances
 
+    def getBalanceSnapshot(self, names, contract="io.token", symbol=CORE_SYMBOL, threads=16):
+        """Returns a dictionary of account name to symbol balance as an integer e.g. 980311 (0 for accounts without a
+        balance, None where the query failed). Queried concurrently over HTTP, through a pool of threads running cl
+        otherwise. Token balances are scoped by owner, so there is one query per account rather than one table scan."""
+        assert(isinstance(names, list))
+        if Utils.UseHttp and not self.enableMongo:
+            return Utils.runAsync(self.asyncNode().getBalanceSnapshot(names, contract, symbol))
+
+        def balance(name):
+            balanceStr=self.getCurrencyBalance(contract, name, symbol)
+            if balanceStr is None:
+                return None
+            # one balance per line, only those in symbol are summed, as on the HTTP path
+            return sum(Node.currencyStrToInt(line.strip()) for line in balanceStr.splitlines()
+                       if line.strip().endswith(" " + symbol))
+        if len(names) == 0:
+            return {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(threads, len(names))) as executor:
+            return dict(zip(names, executor.map(balance, names)))
+
+    @staticmethod
+    def diffBalances(expected, actual):
+        """Returns a dictionary of account name to (expected, actual) balance for every account of expected whose
+        balance in actual (name to balance dictionaries, see getBalanceSnapshot) differs."""
+        return {name: (balance, actual.get(name)) for name,balance in expected.items() if actual.get(name) != balance}
+
     # Gets accounts mapped to key. Returns json object
     def getAccountsByKey(self, key):
+        if self.rpcEnabled("/v1/history/get_key_accounts"):
+            try:
+                return self.rpcCall("/v1/history/get_key_accounts", {"public_key": key})
+            except RpcUnsupportedError as _:
+                pass
+            except RpcError as ex:
+                Utils.Print("ERROR: Exception during accounts by key retrieval. %s" % (ex))
+                return None
+
         cmd="%s %s get accounts %s" % (Utils.ClientPath, self.endpointArgs, key)
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
         try:
@@ -824,6 +1640,15 @@ class Node(object):
         assert(isinstance(pos, int))
         assert(isinstance(offset, int))
 
+        if self.rpcEnabled("/v1/history/get_actions"):
+            try:
+                return self.rpcCall("/v1/history/get_actions", {"account_name": account.name, "pos": pos, "offset": offset})
+            except RpcUnsupportedError as _:
+                pass
+            except RpcError as ex:
+                Utils.Print("ERROR: Exception during actions by account retrieval. %s" % (ex))
+                return None
+
         cmd="%s %s get actions -j %s %d %d" % (Utils.ClientPath, self.endpointArgs, account.name, pos, offset)
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
         try:
@@ -834,6 +1659,69 @@ class Node(object):
             Utils.Print("ERROR: Exception during actions by account retrieval. %s" % (msg))
             return None
 
+    def iterActions(self, account, start=0, page=100, prefetch=4, cursorPath=None):
+        """Generator of account's actions (get actions json objects) in account_action_seq order from sequence number
+        start up to the newest. Pages of page actions are requested prefetch pages ahead (concurrently over HTTP, from a
+        thread pool otherwise), so memory stays bounded however long the history. With cursorPath, the sequence number
+        to continue from is saved there after every consumed page and iteration resumes from it, ignoring start, when
+        the file exists for the same account; actions of a page interrupted mid-way are yielded again on resume.
+        Iteration ends on a page without actions. A short page may be the server cutting it off at its time or size
+        limit, so the next request continues right after its last action. Raises RpcError if a page cannot be
+        fetched."""
+        assert(isinstance(account, Account))
+        assert(page > 0 and prefetch > 0)
+        if cursorPath is not None and os.path.exists(cursorPath):
+            with open(cursorPath, "r") as f:
+                cursor=json.load(f)
+            if cursor.get("account") == account.name:
+                start=int(cursor["next"])
+
+        useAsync=self.rpcEnabled("/v1/history/get_actions")
+        executor=None if useAsync else concurrent.futures.ThreadPoolExecutor(max_workers=prefetch)
+        def request(pos):
+            # pos .. pos+offset inclusive
+            if useAsync:
+                return Utils.submitAsync(self.asyncNode().getActions(account.name, pos, page-1))
+            return executor.submit(self.getActions, account, pos, page-1)
+
+        def saveCursor(nextSeq):
+            tmpPath=cursorPath + ".tmp"
+            with open(tmpPath, "w") as f:
+                json.dump({"account": account.name, "next": nextSeq}, f)
+            os.replace(tmpPath, cursorPath)
+
+        pending=deque()
+        nextPos=start
+        try:
+            while True:
+                while len(pending) < prefetch:
+                    pending.append((nextPos, request(nextPos)))
+                    nextPos += page
+                pos,future=pending.popleft()
+                ret=future.result()
+                if ret is None:
+                    raise RpcError("Failed to get actions %d-%d of %s" % (pos, pos+page-1, account.name))
+                actions=sorted([action for action in ret.get("actions", []) if int(action["account_action_seq"]) >= pos],
+                               key=lambda action: int(action["account_action_seq"]))
+                if len(actions) == 0:
+                    return
+                for action in actions:
+                    yield action
+                lastSeq=int(actions[-1]["account_action_seq"])
+                if cursorPath is not None:
+                    saveCursor(lastSeq + 1)
+                if lastSeq < pos + page - 1:
+                    # end of the history or a truncated page, the pages requested ahead may leave a gap
+                    for _,future in pending:
+                        future.cancel()
+                    pending.clear()
+                    nextPos=lastSeq + 1
+        finally:
+            for _,future in pending:
+                future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
+
     # Gets accounts mapped to key. Returns array
     def getAccountsArrByKey(self, key):
         trans=self.getAccountsByKey(key)
@@ -843,6 +1731,15 @@ class Node(object):
         return accounts
 
     def getServants(self, name):
+        if self.rpcEnabled("/v1/history/get_controlled_accounts"):
+            try:
+                return self.rpcCall("/v1/history/get_controlled_accounts", {"controlling_account": name})
+            except RpcUnsupportedError as _:
+                pass
+            except RpcError as ex:
+                Utils.Print("ERROR: Exception during servants retrieval. %s" % (ex))
+                return None
+
         cmd="%s %s get servants %s" % (Utils.ClientPath, self.endpointArgs, name)
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
         try:
@@ -948,13 +1845,120 @@ class Node(object):
         if idx < 0:
             Utils.Print("ERROR: Table index cannot be negative. idx: %d" % (idx))
             return None
-        rows=self.getTableRows(contract, scope, table)
+        # the first idx+1 rows only, not the whole table
+        jsonData=self.getTablePage(contract, scope, table, limit=idx+1)
+        rows=None if jsonData is None else jsonData["rows"]
         if rows is None or idx >= len(rows):
             Utils.Print("ERROR: Retrieved table does not contain row %d" % idx)
             return None
         row=rows[idx]
         return row
 
+    def getTablePage(self, contract, scope, table, lowerBound=None, limit=None):
+        """Returns get table rows json object (rows, more) of up to limit rows (nod's default if None) starting at
+        primary key lowerBound (integer)."""
+        if self.rpcEnabled("/v1/chain/get_table_rows"):
+            params={"json": True, "code": contract, "scope": scope, "table": table}
+            if lowerBound is not None:
+                params["lower_bound"]=str(lowerBound)
+            if limit is not None:
+                params["limit"]=limit
+            try:
+                return self.rpcCall("/v1/chain/get_table_rows", params)
+            except RpcUnsupportedError as _:
+                pass
+            except RpcError as ex:
+                Utils.Print("ERROR: Exception during table retrieval. %s" % (ex))
+                return None
+
+        cmd="%s %s get table %s %s %s%s%s" % (Utils.ClientPath, self.endpointArgs, contract, scope, table,
+                                             "" if lowerBound is None else " -L %d" % (lowerBound),
+                                             "" if limit is None else " -l %d" % (limit))
+        if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
+        try:
+            trans=Node.runCmdReturnJson(cmd)
+            return trans
+        except subprocess.CalledProcessError as ex:
+            msg=ex.output.decode("utf-8")
+            Utils.Print("ERROR: Exception during table retrieval. %s" % (msg))
+            return None
+
+    @staticmethod
+    def rowPrimaryKey(row):
+        """Default primary key of a table row: its id field."""
+        try:
+            return int(row["id"])
+        except (TypeError, KeyError, ValueError) as _:
+            raise ValueError("Table row has no id field, pass the table's primary key function. Row: %s" % (row))
+
+    def iterTableRows(self, contract, scope, table, lowerBound=None, limit=100, key=None, retries=3):
+        """Generator of table rows in primary key order starting at primary key lowerBound (integer, the start of the
+        table if None). Rows are requested limit at a time; the next page is requested as soon as a page arrives, so it
+        downloads while the current one is consumed. key(row) returns a row's primary key (default rowPrimaryKey), used
+        to continue after the last row of a page (use nameToInt for tables keyed by name). A page that comes back empty
+        but with more set (nod's time limit ran out before the first row) is requested again, up to retries times.
+        Raises RpcError if a page cannot be fetched."""
+        if key is None:
+            key=Node.rowPrimaryKey
+        useAsync=self.rpcEnabled("/v1/chain/get_table_rows")
+        executor=None if useAsync else concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        def request(bound):
+            if useAsync:
+                return Utils.submitAsync(self.asyncNode().getTableRows(contract, scope, table, bound, limit))
+            return executor.submit(self.getTablePage, contract, scope, table, bound, limit)
+
+        future=request(lowerBound)
+        emptyPages=0
+        try:
+            while future is not None:
+                ret=future.result()
+                if ret is None:
+                    raise RpcError("Failed to get %s %s %s rows from %s" % (contract, scope, table, lowerBound))
+                rows=ret.get("rows", [])
+                future=None
+                if ret.get("more"):
+                    if len(rows) == 0:
+                        emptyPages += 1
+                        if emptyPages > retries:
+                            raise RpcError("Got no %s %s %s rows from %s in %d attempts, more rows remain" % (
+                                contract, scope, table, lowerBound, emptyPages))
+                    else:
+                        emptyPages=0
+                        lowerBound=key(rows[-1]) + 1
+                    future=request(lowerBound)
+                yield from rows
+        finally:
+            if future is not None:
+                future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    @staticmethod
+    def diffTableRows(nodeA, nodeB, contract, scope, table, limit=100, key=None):
+        """Generator of (primary key, row on nodeA, row on nodeB) for every row that differs between the two nodes' copy
+        of the table (a missing row is None). Both tables are streamed in primary key order and merged page by page,
+        so neither is held in memory. key as in iterTableRows."""
+        if key is None:
+            key=Node.rowPrimaryKey
+        rowsA=nodeA.iterTableRows(contract, scope, table, limit=limit, key=key)
+        rowsB=nodeB.iterTableRows(contract, scope, table, limit=limit, key=key)
+        rowA=next(rowsA, None)
+        rowB=next(rowsB, None)
+        while rowA is not None or rowB is not None:
+            keyA=None if rowA is None else key(rowA)
+            keyB=None if rowB is None else key(rowB)
+            if keyB is None or (keyA is not None and keyA < keyB):
+                yield (keyA, rowA, None)
+                rowA=next(rowsA, None)
+            elif keyA is None or keyB < keyA:
+                yield (keyB, None, rowB)
+                rowB=next(rowsB, None)
+            else:
+                if rowA != rowB:
+                    yield (keyA, rowA, rowB)
+                rowA=next(rowsA, None)
+                rowB=next(rowsB, None)
+
     def getTableColumns(self, contract, scope, table):
         row=self.getTableRow(contract, scope, table, 0)
         keys=list(row.keys())
@@ -962,6 +1966,25 @@ class Node(object):
 
     # returns tuple with transaction and
     def pushMessage(self, account, action, data, opts, silentErrors=False):
+        auths=Node.parsePermissionOpts(opts)
+        if auths is not None and data is not None and self.rpcPushEnabled():
+            try:
+                actionData=json.loads(data)
+            except ValueError as _:
+                actionData=None
+            if actionData is not None:
+                if Utils.Debug: Utils.Print("rpc push action: %s %s %s %s" % (account, action, data, opts))
+                try:
+                    trans=self.pushTransaction([{"account": account, "name": action, "authorization": auths, "data": actionData}])
+                    return (True, trans)
+                except RpcUnsupportedError as _:
+                    pass
+                except RpcError as ex:
+                    msg=str(ex)
+                    if not silentErrors:
+                        Utils.Print("ERROR: Exception during push message. %s" % (msg))
+                    return (False, msg)
+
         cmd="%s %s push action -j %s %s" % (Utils.ClientPath, self.endpointArgs, account, action)
         cmdArr=cmd.split()
         if data is not None:
@@ -997,6 +2020,16 @@ class Node(object):
         return trans
 
     def getInfo(self, silentErrors=False):
+        if self.rpcEnabled("/v1/chain/get_info"):
+            try:
+                return self.rpcCall("/v1/chain/get_info")
+            except RpcUnsupportedError as _:
+                pass
+            except RpcError as ex:
+                if not silentErrors:
+                    Utils.Print("ERROR: Exception during get info. %s" % (ex))
+                return None
+
         cmd="%s %s get info" % (Utils.ClientPath, self.endpointArgs)
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
         try:
@@ -1076,6 +2109,8 @@ class Node(object):
         # mark node as killed
         self.pid=None
         self.killed=True
+        if self.__blockFollower is not None:
+            self.__blockFollower.stop()
         return True
 
     # TBD: make nodeId an internal property
@@ -1107,9 +2142,467 @@ class Node(object):
         return True
 
 
+###########################################################################################
+class AsyncNode(object):
+    """asyncio counterpart of Node. Coroutines mirror the Node getters (HTTP only) and return None on failure. The
+    number of concurrent requests against the node is bounded by maxInFlight."""
+
+    def __init__(self, host, port, maxInFlight=16):
+        self.host=host
+        self.port=port
+        self.rpc=AsyncHttpClient(host, port, maxInFlight=maxInFlight)
+
+    def __str__(self):
+        return "Host: %s, Port:%d" % (self.host, self.port)
+
+    async def rpcCall(self, path, params=None, errorMsg=None, silentErrors=False):
+        """POST params to endpoint path. Returns json object, None on failure."""
+        if Utils.Debug: Utils.Print("async rpc: %s%s %s" % (self.rpc, path, "" if params is None else json.dumps(params)))
+        try:
+            return await self.rpc.post(path, params)
+        except RpcError as ex:
+            if not silentErrors:
+                Utils.Print("ERROR: Exception during %s. %s" % (errorMsg if errorMsg else path, ex))
+            return None
+
+    async def getInfo(self, silentErrors=False):
+        return await self.rpcCall("/v1/chain/get_info", errorMsg="get info", silentErrors=silentErrors)
+
+    async def getBlock(self, blockNum, silentErrors=False):
+        assert(isinstance(blockNum, str))
+        return await self.rpcCall("/v1/chain/get_block", {"block_num_or_id": blockNum}, "get block", silentErrors)
+
+    async def getTransaction(self, transId, silentErrors=False):
+        return await self.rpcCall("/v1/history/get_transaction", {"transaction_id": transId}, "transaction retrieval",
+                                  silentErrors)
+
+    async def getTableRows(self, contract, scope, table, lowerBound=None, limit=None, silentErrors=False):
+        """Returns get_table_rows json object (rows, more)."""
+        params={"json": True, "code": contract, "scope": scope, "table": table}
+        if lowerBound is not None:
+            params["lower_bound"]=str(lowerBound)
+        if limit is not None:
+            params["limit"]=limit
+        return await self.rpcCall("/v1/chain/get_table_rows", params, "table retrieval", silentErrors)
+
+    async def pushTransaction(self, packedTrx, silentErrors=False):
+        """Push an already signed transaction (see Node.packedTransaction). Returns push transaction json object."""
+        return await self.rpcCall("/v1/chain/push_transaction", packedTrx, "push transaction", silentErrors)
+
+    async def getAccount(self, name, silentErrors=False):
+        assert(isinstance(name, str))
+        return await self.rpcCall("/v1/chain/get_account", {"account_name": name}, "get account", silentErrors)
+
+    async def getActions(self, name, pos=-1, offset=-1, silentErrors=False):
+        return await self.rpcCall("/v1/history/get_actions", {"account_name": name, "pos": pos, "offset": offset},
+                                  "actions by account retrieval", silentErrors)
+
+    async def getAccountsByKey(self, key, silentErrors=False):
+        return await self.rpcCall("/v1/history/get_key_accounts", {"public_key": key}, "accounts by key retrieval", silentErrors)
+
+    async def getCurrencyBalance(self, contract, account, symbol=CORE_SYMBOL, silentErrors=False):
+        """Returns list of balance strings e.g. ['99999.9950 CUR']."""
+        return await self.rpcCall("/v1/chain/get_currency_balance", {"code": contract, "account": account, "symbol": symbol},
+                                  "get currency balance", silentErrors)
+
+    async def getAccountBalance(self, scope):
+        """Returns SYS currency0000 account balance as an integer e.g. 980311. None on failure."""
+        trans=await self.getTableRows("io.token", scope, "accounts")
+        if trans is None:
+            return None
+        try:
+            return Node.currencyStrToInt(trans["rows"][0]["balance"])
+        except (TypeError, KeyError, IndexError) as _:
+            Utils.Print("Transaction parsing failed. Transaction: %s" % (trans))
+            raise
+
+    async def getBalanceSnapshot(self, names, contract="io.token", symbol=CORE_SYMBOL):
+        """Returns a dictionary of account name to symbol balance as an integer, see Node.getBalanceSnapshot."""
+        assert(isinstance(names, list))
+        results=await asyncio.gather(*[self.getCurrencyBalance(contract, name, symbol) for name in names])
+        snapshot={}
+        for name,balances in zip(names, results):
+            if balances is None:
+                snapshot[name]=None
+            else:
+                snapshot[name]=sum(Node.currencyStrToInt(balance) for balance in balances if balance.endswith(" " + symbol))
+        return snapshot
+
+    async def doesNodeHaveBlockNum(self, blockNum):
+        assert isinstance(blockNum, int)
+        assert (blockNum > 0)
+
+        info=await self.getInfo(silentErrors=True)
+        assert(info)
+        return Node.infoHasBlockNum(info, blockNum)
+
+
+###########################################################################################
+class BlockFollower(object):
+    """Follows a node's blocks incrementally and keeps a transaction id to block number index over a contiguous block
+    range. Blocks more than maxBlocks behind the newest indexed block are evicted."""
+
+    # pollInterval: get info polling period of the background thread, half of the 0.5 second block interval
+    # fetchWindow: blocks requested ahead while catching up (see Node.iterBlocks)
+    def __init__(self, node, maxBlocks=20000, pollInterval=0.25, fetchWindow=8):
+        self.node=node
+        self.maxBlocks=maxBlocks
+        self.pollInterval=pollInterval
+        self.fetchWindow=fetchWindow
+        self.lowBlockNum=None   # oldest indexed block
+        self.highBlockNum=None  # newest indexed block
+        self.info=None          # latest get info seen by the background thread
+        self.__blockTrxs={}     # block number -> transaction ids
+        self.__blockIds={}      # block number -> block id
+        self.__trxIndex={}      # transaction id -> block number
+        self.__lock=threading.RLock()
+        self.__cond=threading.Condition(self.__lock)
+        self.__thread=None
+        self.__stopEvent=threading.Event()
+        self.__listeners=[]
+        Utils.registerForkReset(self)
+
+    def resetAfterFork(self):
+        # the polling thread is gone in the child and may have held the lock; indexed blocks are kept, the parent's
+        # listeners are not
+        self.__lock=threading.RLock()
+        self.__cond=threading.Condition(self.__lock)
+        self.__thread=None
+        self.__stopEvent=threading.Event()
+        self.__listeners=[]
+
+    def addListener(self, listener):
+        """listener.onBlock(blockNum, blockId, transIds) is called for each newly followed block, and again with the new
+        block id for blocks replaced by a fork switch, listener.onInfo(info) after
+        each get info poll (once that poll's blocks are indexed). Both are called with the follower lock held."""
+        with self.__lock:
+            self.__listeners.append(listener)
+
+    def removeListener(self, listener):
+        with self.__lock:
+            self.__listeners.remove(listener)
+
+    @staticmethod
+    def blockTransIds(block):
+        """Returns list of transaction ids contained in block json object."""
+        transIds=[]
+        for trans in block.get("transactions", []):
+            try:
+                trx=trans["trx"]
+                transIds.append(trx if isinstance(trx, str) else trx["id"]) # deferred transactions only carry the id
+            except (TypeError, KeyError) as _:
+                Utils.Print("Failed to parse block transactions. %s" % (trans))
+        return transIds
+
+    def __dropBlock(self, blockNum):
+        self.__blockIds.pop(blockNum, None)
+        for transId in self.__blockTrxs.pop(blockNum, []):
+            if self.__trxIndex.get(transId) == blockNum:
+                del self.__trxIndex[transId]
+
+    def __indexBlock(self, blockNum, block):
+        blockId=block.get("id")
+        if blockNum in self.__blockTrxs and self.__blockIds.get(blockNum) != blockId:
+            self.__dropBlock(blockNum) # replaced by a fork switch
+        transIds=BlockFollower.blockTransIds(block)
+        self.__blockTrxs[blockNum]=transIds
+        self.__blockIds[blockNum]=blockId
+        for transId in transIds:
+            self.__trxIndex[transId]=blockNum
+
+    def __switchFork(self, blockNum):
+        """Re-index the blocks below blockNum whose ids changed, down to the newest one still on the node's chain.
+        Returns False if a block is unavailable."""
+        for num in range(blockNum, self.lowBlockNum-1, -1):
+            block=self.__fetch(num)
+            if block is None:
+                return False
+            if self.__blockIds.get(num) == block.get("id"):
+                return True
+            if Utils.Debug: Utils.Print("BlockFollower: block %d replaced on %s" % (num, self.node))
+            self.__indexBlock(num, block)
+            for listener in self.__listeners:
+                listener.onBlock(num, self.__blockIds[num], self.__blockTrxs[num])
+        return True
+
+    def __evict(self):
+        while self.highBlockNum - self.lowBlockNum >= self.maxBlocks:
+            self.__dropBlock(self.lowBlockNum)
+            self.lowBlockNum += 1
+
+    def __fetch(self, blockNum):
+        block=self.node.getBlock(str(blockNum), retry=False, silentErrors=True)
+        if block is None and Utils.Debug: Utils.Print("BlockFollower: block %d not available on %s" % (blockNum, self.node))
+        return block
+
+    def start(self, blockNum):
+        """Begin following at blockNum. No-op if already following."""
+        with self.__lock:
+            if self.lowBlockNum is None:
+                self.lowBlockNum=blockNum
+                self.highBlockNum=blockNum-1
+
+    def catchUp(self, headBlockNum=None):
+        """Index every block after highBlockNum up to headBlockNum (node head if None). Returns highBlockNum."""
+        with self.__lock:
+            if self.lowBlockNum is None:
+                return None
+            if headBlockNum is None:
+                headBlockNum=self.node.getHeadBlockNum()
+                if headBlockNum is None:
+                    return self.highBlockNum
+            blocks=self.node.iterBlocks(self.highBlockNum+1, headBlockNum, self.fetchWindow, silentErrors=True)
+            for blockNum,block in blocks:
+                if block is None:
+                    if Utils.Debug: Utils.Print("BlockFollower: block %d not available on %s" % (blockNum, self.node))
+                    blocks.close()
+                    break
+                previousId=self.__blockIds.get(blockNum-1)
+                if previousId is not None and block.get("previous") not in (None, previousId) and \
+                   not self.__switchFork(blockNum-1):
+                    blocks.close()
+                    break
+                self.__indexBlock(blockNum, block)
+                self.highBlockNum=blockNum
+                for listener in self.__listeners:
+                    listener.onBlock(blockNum, self.__blockIds[blockNum], self.__blockTrxs[blockNum])
+            self.__evict()
+            return self.highBlockNum
+
+    def backfill(self, blockNum):
+        """Extend the indexed range down to blockNum, as long as it stays within maxBlocks. Returns lowBlockNum."""
+        with self.__lock:
+            blockNum=max(blockNum, self.highBlockNum - self.maxBlocks + 1, 1)
+            for num in range(self.lowBlockNum-1, blockNum-1, -1):
+                block=self.__fetch(num)
+                if block is None:
+                    break
+                self.__indexBlock(num, block)
+                self.lowBlockNum=num
+            return self.lowBlockNum
+
+    def find(self, transId):
+        """Dictionary lookup only. Returns block number or None."""
+        return self.__trxIndex.get(transId)
+
+    def lookup(self, transId, refBlockNum, headBlockNum=None):
+        """Returns number of the block containing transId, None if not (yet) in a block. refBlockNum is the oldest
+        block the transaction may be in. Blocks older than the indexed window are scanned without indexing."""
+        with self.__lock:
+            self.start(refBlockNum)
+            blockNum=self.find(transId)
+            if blockNum is not None:
+                return blockNum
+            self.catchUp(headBlockNum)
+            if refBlockNum < self.lowBlockNum:
+                self.backfill(refBlockNum)
+            blockNum=self.find(transId)
+            if blockNum is not None or refBlockNum >= self.lowBlockNum:
+                return blockNum
+            low=self.lowBlockNum
+
+        # evicted range
+        for num in range(refBlockNum, low):
+            if self.node.isTransInBlock(str(transId), str(num)):
+                return num
+        return None
+
+    def size(self):
+        return len(self.__trxIndex)
+
+    def headBlockNum(self):
+        return None if self.info is None else int(self.info["head_block_num"])
+
+    def lastIrreversibleBlockNum(self):
+        return None if self.info is None else int(self.info["last_irreversible_block_num"])
+
+    def isRunning(self):
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def run(self):
+        """Start the background thread (if not running) that tracks head/LIB, indexes new blocks and wakes waiters."""
+        if self.isRunning():
+            return
+        self.__stopEvent.clear()
+        self.__thread=threading.Thread(target=self.__follow, name="follower-%d" % (self.node.port), daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stopEvent.set()
+        with self.__cond:
+            self.__cond.notify_all()
+
+    def poll(self):
+        """One follower step: refresh get info, index new blocks (if following) and notify waiters."""
+        info=self.node.getInfo(silentErrors=True)
+        with self.__cond:
+            if info is not None:
+                self.info=info
+                if self.lowBlockNum is not None:
+                    self.catchUp(int(info["head_block_num"]))
+                for listener in self.__listeners:
+                    listener.onInfo(info)
+            self.__cond.notify_all()
+
+    def __follow(self):
+        while not self.__stopEvent.is_set():
+            try:
+                self.poll()
+            except (RpcError, OSError, subprocess.CalledProcessError, ValueError, KeyError, TypeError) as ex:
+                if Utils.Debug: Utils.Print("BlockFollower %s poll failed. %s" % (self.node, ex))
+            self.__stopEvent.wait(self.pollInterval)
+
+    def waitFor(self, predicate, timeout=None):
+        """Block until predicate(follower) returns a truthy value, which is returned. Returns None on timeout (capped by
+        the Utils global deadline). Runs the background thread if needed."""
+        if timeout is None:
+            timeout=60
+        endTime=time.time()+Utils.effectiveTimeout(timeout)
+        self.run()
+        with self.__cond:
+            while True:
+                ret=predicate(self)
+                if ret:
+                    return ret
+                remaining=endTime - time.time()
+                if remaining <= 0 or self.__stopEvent.is_set():
+                    return None
+                self.__cond.wait(remaining)
+
+
+class EntryNodeStats(object):
+    """Submissions through one entry node."""
+
+    def __init__(self, node):
+        self.node=node
+        self.accepted=0
+        self.failed=0
+        self.latency=LatencyHistogram()
+
+    def summary(self):
+        return "%s:%d accepted %d, failed %d, latency %s" % (
+            self.node.host, self.node.port, self.accepted, self.failed, self.latency.summary())
+
+
+class NodeSelector(object):
+    """Picks the entry node of each submission among the nodes not killed, and keeps per entry node counters, so an
+    overloaded API of one node can be told from slow p2p relay.
+
+    policies:
+      RoundRobin: nodes in turn.
+      LeastLag:   a node with the highest head block (refreshed every lagRefresh seconds), the node with fewest
+                  submissions in flight among those.
+      Weighted:   smooth weighted round robin over weights (list parallel to nodes, default all 1)."""
+
+    RoundRobin="round-robin"
+    LeastLag="least-lag"
+    Weighted="weighted"
+    Policies=[RoundRobin, LeastLag, Weighted]
+
+    def __init__(self, nodes, policy=RoundRobin, weights=None, lagRefresh=0.5):
+        assert(len(nodes) > 0)
+        if policy not in NodeSelector.Policies:
+            raise ValueError("Unknown node selection policy %s, expected one of %s" % (policy, ", ".join(NodeSelector.Policies)))
+        assert(weights is None or len(weights) == len(nodes))
+        self.nodes=nodes
+        self.policy=policy
+        self.weights=weights if weights is not None else [1]*len(nodes)
+        self.lagRefresh=lagRefresh
+        self.stats=[EntryNodeStats(node) for node in nodes]
+        self.__next=0
+        self.__current=[0]*len(nodes)     # smooth weighted round robin state
+        self.__inFlight=[0]*len(nodes)
+        self.__heads=[None]*len(nodes)
+        self.__headsTime=None
+        self.__lock=threading.Lock()
+
+    def __live(self):
+        live=[i for i,node in enumerate(self.nodes) if not node.killed]
+        if len(live) == 0:
+            raise RuntimeError("No active nodes to submit to")
+        return live
+
+    def __refreshHeads(self):
+        # called without the lock, a slow get info must not stall the other submitters
+        with self.__lock:
+            if self.__headsTime is not None and time.time() - self.__headsTime < self.lagRefresh:
+                return
+            self.__headsTime=time.time()
+        heads=[None]*len(self.nodes)
+        for i in self.__live():
+            info=self.nodes[i].getInfo(silentErrors=True)
+            if info is not None:
+                heads[i]=int(info["head_block_num"])
+        with self.__lock:
+            self.__heads=heads
+
+    def __select(self):
+        live=self.__live()
+        if self.policy == NodeSelector.LeastLag:
+            newest=max([self.__heads[i] for i in live if self.__heads[i] is not None], default=None)
+            candidates=[i for i in live if newest is None or self.__heads[i] == newest]
+            return min(candidates, key=lambda i: self.__inFlight[i])
+        if self.policy == NodeSelector.Weighted:
+            total=sum(self.weights[i] for i in live)
+            for i in live:
+                self.__current[i] += self.weights[i]
+            idx=max(live, key=lambda i: self.__current[i])
+            self.__current[idx] -= total
+            return idx
+        while True:
+            idx=self.__next % len(self.nodes)
+            self.__next=idx + 1
+            if idx in live:
+                return idx
+
+    def select(self):
+        """Returns the next entry node. The submission counts as in flight on it until passed to record."""
+        if self.policy == NodeSelector.LeastLag:
+            self.__refreshHeads()
+        with self.__lock:
+            idx=self.__select()
+            self.__inFlight[idx] += 1
+            return self.nodes[idx]
+
+    def submit(self, fn):
+        """Call fn(entry node), counting it against that node: None or False returns are failures. Returns fn's
+        return value."""
+        node=self.select()
+        start=time.time()
+        ret=None
+        try:
+            ret=fn(node)
+            return ret
+        finally:
+            self.record(node, ret is not None and ret is not False, time.time() - start)
+
+    def record(self, node, ok, seconds):
+        """Count a submission made through node, exactly once per select that returned it."""
+        idx=self.nodes.index(node)
+        with self.__lock:
+            self.__inFlight[idx] -= 1
+            stats=self.stats[idx]
+            if ok:
+                stats.accepted += 1
+                stats.latency.recordSeconds(seconds)
+            else:
+                stats.failed += 1
+
+    def report(self):
+        return "\n".join(["entry node %s" % (stats.summary()) for stats in self.stats])
+
+
 ###########################################################################################
 
 Wallet=namedtuple("Wallet", "name password host port")
+
+NodeSyncStatus=namedtuple("NodeSyncStatus", "node headBlockNum libBlockNum lagBlocks lagMs synced")
+
+# chains of nodeA and nodeB agree up to commonBlockNum; divergentBlockNum (None if they agree up to the lower head) is
+# the first height they differ at, with each side's block id and producer. irreversible: divergence at or below both
+# nodes' last irreversible block. undetermined: divergentBlockNum could not be fetched from one of the nodes (its id is
+# None), so the pair is only known to agree up to commonBlockNum
+ForkPoint=namedtuple("ForkPoint", "nodeA nodeB commonBlockNum divergentBlockNum idA idB producerA producerB irreversible undetermined")
 # pylint: disable=too-many-instance-attributes
 class WalletMgr(object):
     __walletLogFile="test_kd_output.log"
@@ -1130,6 +2623,10 @@ class WalletMgr(object):
         if self.walletd:
             self.walletEndpointArgs += " --wallet-url http://%s:%d" % (self.host, self.port)
             self.endpointArgs += self.walletEndpointArgs
+        self.rpc=None
+        if Utils.UseHttp:
+            # without kd the wallet_api_plugin is served by nod
+            self.rpc=HttpClient(self.host, self.port) if self.walletd else HttpClient(self.nodHost, self.nodPort)
 
     def launch(self):
         if not self.walletd:
@@ -1201,6 +2698,57 @@ class WalletMgr(object):
 
         return True
 
+    # importKeys per key status
+    KeyImported="imported"
+    KeyExists="exists"
+    KeyFailed="failed"
+
+    def importKeyWithClient(self, privateKey, wallet):
+        """Import a single private key through cl. Returns (status, error message)."""
+        cmd="%s %s wallet import --name %s %s" % (Utils.ClientPath, self.endpointArgs, wallet.name, privateKey)
+        if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
+        try:
+            subprocess.check_output(cmd.split(), stderr=subprocess.STDOUT).decode("utf-8")
+        except subprocess.CalledProcessError as ex:
+            msg=ex.output.decode("utf-8")
+            if "Key already in wallet" in msg:
+                return (WalletMgr.KeyExists, None)
+            return (WalletMgr.KeyFailed, msg)
+        return (WalletMgr.KeyImported, None)
+
+    def importKeyWithRpc(self, privateKey, wallet):
+        """Import a single private key through the wallet HTTP API. Returns (status, error message)."""
+        try:
+            self.rpc.post("/v1/wallet/import_key", [wallet.name, privateKey])
+        except RpcUnsupportedError as _:
+            return self.importKeyWithClient(privateKey, wallet)
+        except RpcError as ex:
+            if "Key already in wallet" in str(ex):
+                return (WalletMgr.KeyExists, None)
+            return (WalletMgr.KeyFailed, str(ex))
+        return (WalletMgr.KeyImported, None)
+
+    def importKeys(self, accounts, wallet, threads=16):
+        """Import owner and active keys of all accounts into wallet. The wallet API takes one key per request, so over
+        HTTP requests are kept in flight concurrently on the pooled connections; otherwise cl is run per key.
+        Returns list of (account, private key, status, error message) where status is one of KeyImported, KeyExists or
+        KeyFailed."""
+        keys=[]
+        for account in accounts:
+            keys.append((account, account.ownerPrivateKey))
+            if account.activePrivateKey is None:
+                Utils.Print("WARNING: Active private key is not defined for account \"%s\"" % (account.name))
+            elif account.activePrivateKey != account.ownerPrivateKey:
+                keys.append((account, account.activePrivateKey))
+
+        importer=self.importKeyWithClient
+        if self.rpc is not None and self.rpc.supports("/v1/wallet/import_key"):
+            importer=self.importKeyWithRpc
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            results=list(executor.map(lambda key: importer(key[1], wallet), keys))
+
+        return [(account, key, status, msg) for (account, key),(status, msg) in zip(keys, results)]
+
     def lockWallet(self, wallet):
         cmd="%s %s wallet lock --name %s" % (Utils.ClientPath, self.endpointArgs, wallet.name)
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
@@ -1293,6 +2841,8 @@ class Cluster(object):
     __localHost="localhost"
     __BiosHost="localhost"
     __BiosPort=8788
+    # (phase, seconds) of the last bootstrap
+    bootstrapTimings=[]
 
     # pylint: disable=too-many-arguments
     # walletd [True|False] Is kd running. If not load the wallet plugin
@@ -1404,6 +2954,12 @@ class Cluster(object):
 
         self.nodes=nodes
 
+        if Utils.UseHttp:
+            notReady=Cluster.waitOnNodesReady(nodes, timeout=Utils.systemWaitTimeout)
+            if len(notReady) > 0:
+                Utils.Print("ERROR: %s instances not answering: %s" % (Utils.ServerName, ", ".join(str(node) for node in notReady)))
+                return False
+
         if onlyBios:
             biosNode=Node(Cluster.__BiosHost, Cluster.__BiosPort)
             biosNode.setWalletEndpointArgs(self.walletEndpointArgs)
@@ -1515,21 +3071,188 @@ class Cluster(object):
 
         return self.waitOnClusterBlockNumSync(targetHeadBlockNum, timeout)
 
-    def waitOnClusterBlockNumSync(self, targetHeadBlockNum, timeout=None):
+    def getSyncReport(self, targetHeadBlockNum=None, nodes=None):
+        """Query get info on every live node (nodes defaults to the cluster nodes) concurrently. Returns a list of
+        NodeSyncStatus, one per node. Lag in blocks is measured against targetHeadBlockNum, or against the most advanced
+        node if no target is given; lag in milliseconds is measured against the newest head block time reported.
+        Nodes that did not answer have None fields and are not synced."""
+        if nodes is None:
+            nodes=self.nodes
+        liveNodes=[node for node in nodes if not node.killed]
+        if Utils.UseHttp:
+            infos=Utils.runAsyncAll([node.asyncNode().getInfo(silentErrors=True) for node in liveNodes])
+        elif len(liveNodes) > 0:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(liveNodes)) as executor:
+                infos=list(executor.map(lambda node: node.getInfo(silentErrors=True), liveNodes))
+        else:
+            infos=[]
 
-        def doNodesHaveBlockNum(nodes, targetHeadBlockNum):
-            for node in nodes:
-                if (not node.killed) and (not node.doesNodeHaveBlockNum(targetHeadBlockNum)):
-                    return False
+        answered=[info for info in infos if info is not None]
+        if targetHeadBlockNum is None:
+            targetHeadBlockNum=max([int(info["head_block_num"]) for info in answered], default=0)
+        newestTime=max([Node.blockTimeToDatetime(info["head_block_time"]) for info in answered], default=None)
 
-            return True
+        report=[]
+        for node,info in zip(liveNodes, infos):
+            if info is None:
+                report.append(NodeSyncStatus(node, None, None, None, None, False))
+                continue
+            headBlockNum=int(info["head_block_num"])
+            lagMs=int((newestTime - Node.blockTimeToDatetime(info["head_block_time"])).total_seconds()*1000)
+            report.append(NodeSyncStatus(node, headBlockNum, int(info["last_irreversible_block_num"]),
+                                         max(0, targetHeadBlockNum-headBlockNum), lagMs,
+                                         headBlockNum >= targetHeadBlockNum))
+        return report
 
-        lam = lambda: doNodesHaveBlockNum(self.nodes, targetHeadBlockNum)
-        ret=Utils.waitForBool(lam, timeout)
+    @staticmethod
+    def printSyncReport(report):
+        for status in report:
+            if status.headBlockNum is None:
+                Utils.Print("Node %s:%d: no response" % (status.node.host, status.node.port))
+                continue
+            Utils.Print("Node %s:%d: head %d, lib %d, lag %d blocks (%d ms)%s" % (
+                status.node.host, status.node.port, status.headBlockNum, status.libBlockNum, status.lagBlocks,
+                status.lagMs, "" if status.synced else ", not synced"))
+
+    def findForks(self, nodes=None, fanout=8, retries=3):
+        """Compare the chains of every pair of live nodes (nodes defaults to the cluster nodes) up to the lower of
+        their heads. Returns list of ForkPoint, one per pair. Block ids chain every block to its predecessor, so the
+        blocks two nodes agree on are a prefix: each round fetches fanout evenly spaced heights from both nodes at
+        once and narrows the range to the first disagreement, taking O(log height) rounds. Pairs are searched
+        concurrently and share fetched blocks. A block a node fails to return is requested up to retries more times;
+        if it still is not returned the search of that pair stops there and its ForkPoint is undetermined."""
+        statuses=[status for status in self.getSyncReport(nodes=nodes) if status.headBlockNum is not None]
+        blocks={} # (status index, block number) -> block json object or None
+        lock=threading.Lock()
+
+        def fetch(keys):
+            with lock:
+                missing=list(set(key for key in keys if key not in blocks))
+            for attempt in range(retries+1):
+                if len(missing) == 0:
+                    break
+                if attempt > 0:
+                    time.sleep(0.25)
+                if Utils.UseHttp:
+                    fetched=Utils.runAsyncAll([statuses[i].node.asyncNode().getBlock(str(blockNum), silentErrors=True)
+                                               for i,blockNum in missing])
+                else:
+                    with concurrent.futures.ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                        fetched=list(executor.map(lambda key: statuses[key[0]].node.getBlock(
+                            str(key[1]), retry=False, silentErrors=True), missing))
+                with lock:
+                    blocks.update(zip(missing, fetched))
+                missing=[key for key,block in zip(missing, fetched) if block is None]
+            with lock:
+                return [blocks[key] for key in keys]
+
+        def blockId(block):
+            return None if block is None else block.get("id")
+
+        def agree(i, j, blockNums):
+            """Returns per block number True if both nodes returned the same block, False if both returned blocks with
+            different ids, None if either block could not be fetched."""
+            fetched=fetch([(i, blockNum) for blockNum in blockNums] + [(j, blockNum) for blockNum in blockNums])
+            return [None if blockId(a) is None or blockId(b) is None else blockId(a) == blockId(b)
+                    for a,b in zip(fetched[:len(blockNums)], fetched[len(blockNums):])]
+
+        def search(i, j):
+            a=statuses[i]
+            b=statuses[j]
+            # low: highest height known common (0 stands for before genesis), high: lowest height known to differ
+            low,high=0,min(a.headBlockNum, b.headBlockNum)
+            same=agree(i, j, [high])[0]
+            if same:
+                return ForkPoint(a.node, b.node, high, None, None, None, None, None, False, False)
+            while same is not None and high - low > 1:
+                step=max(1, (high - low) // (fanout + 1))
+                probes=list(range(low + step, high, step))[:fanout]
+                for blockNum,same in zip(probes, agree(i, j, probes)):
+                    if not same:
+                        high=blockNum
+                        break
+                    low=blockNum
+            blockA,blockB=fetch([(i, high), (j, high)])
+            undetermined=blockA is None or blockB is None
+            return ForkPoint(a.node, b.node, low, high, blockId(blockA), blockId(blockB),
+                             None if blockA is None else blockA.get("producer"),
+                             None if blockB is None else blockB.get("producer"),
+                             not undetermined and high <= min(a.libBlockNum, b.libBlockNum), undetermined)
+
+        pairs=[(i, j) for i in range(len(statuses)) for j in range(i+1, len(statuses))]
+        if len(pairs) == 0:
+            return []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(16, len(pairs))) as executor:
+            return list(executor.map(lambda pair: search(*pair), pairs))
+
+    @staticmethod
+    def printForkReport(forks):
+        for fork in forks:
+            if fork.divergentBlockNum is None:
+                Utils.Print("Nodes %s:%d and %s:%d agree up to block %d" % (
+                    fork.nodeA.host, fork.nodeA.port, fork.nodeB.host, fork.nodeB.port, fork.commonBlockNum))
+                continue
+            if fork.undetermined:
+                Utils.Print("Nodes %s:%d and %s:%d agree up to block %d, block %d could not be fetched from both" % (
+                    fork.nodeA.host, fork.nodeA.port, fork.nodeB.host, fork.nodeB.port, fork.commonBlockNum,
+                    fork.divergentBlockNum))
+                continue
+            Utils.Print("Nodes %s:%d and %s:%d diverge at block %d%s (common up to %d): %s produced by %s vs %s produced by %s" % (
+                fork.nodeA.host, fork.nodeA.port, fork.nodeB.host, fork.nodeB.port, fork.divergentBlockNum,
+                " below last irreversible" if fork.irreversible else "", fork.commonBlockNum,
+                fork.idA, fork.producerA, fork.idB, fork.producerB))
+
+    def waitOnClusterBlockNumSync(self, targetHeadBlockNum, timeout=None):
+        """Wait until the head block of every live node reaches targetHeadBlockNum. Over HTTP the nodes' block followers
+        are waited on, otherwise all nodes are checked concurrently each round. Returns as soon as the last one gets
+        there; the per node sync report is printed on timeout."""
+        report=[]
+        liveNodes=[node for node in self.nodes if not node.killed]
+        if all(node.useBlockFollower() for node in liveNodes):
+            # followers of all nodes tick concurrently, so waiting on them one after the other costs the slowest node
+            if timeout is None:
+                timeout=60
+            endTime=time.time()+Utils.effectiveTimeout(timeout)
+            ret=all(node.waitForBlockNumOnNode(targetHeadBlockNum, max(0, endTime - time.time())) for node in liveNodes)
+        else:
+            def doNodesHaveBlockNum():
+                report[:]=self.getSyncReport(targetHeadBlockNum)
+                return all(status.synced for status in report)
+
+            ret=Utils.waitForBool(doNodesHaveBlockNum, timeout, sleepTime=0.25)
+
+        if not ret or Utils.Debug:
+            if len(report) == 0:
+                report=self.getSyncReport(targetHeadBlockNum)
+            Utils.Print("Cluster sync report for block %d:" % (targetHeadBlockNum))
+            Cluster.printSyncReport(report)
         return ret
 
     @staticmethod
     def createAccountKeys(count):
+        """Returns count Account objects with random names and freshly generated owner and active keys. Keys are
+        generated in-process on a process pool, through cl create key if that is not supported."""
+        if not KeyGenerator.isSupported():
+            return Cluster.createAccountKeysWithClient(count)
+
+        keys=KeyGenerator.generateKeyPairsParallel(2*count)
+        accounts=[]
+        for i in range(0, count):
+            ownerPrivate,ownerPublic=keys[2*i]
+            activePrivate,activePublic=keys[2*i+1]
+            name=''.join(random.choice(string.ascii_lowercase) for _ in range(12))
+            account=Account(name)
+            account.ownerPrivateKey=ownerPrivate
+            account.ownerPublicKey=ownerPublic
+            account.activePrivateKey=activePrivate
+            account.activePublicKey=activePublic
+            accounts.append(account)
+            if Utils.Debug: Utils.Print("name: %s, key(owner): ['%s', '%s], key(active): ['%s', '%s']" % (name, ownerPublic, ownerPrivate, activePublic, activePrivate))
+
+        return accounts
+
+    @staticmethod
+    def createAccountKeysWithClient(count):
         accounts=[]
         p = re.compile('Private key: (.+)\nPublic key: (.+)\n', re.MULTILINE)
         for _ in range(0, count):
@@ -1591,21 +3314,18 @@ class Cluster(object):
                 Utils.Print("Account keys creation failed.")
                 return False
 
-        Utils.Print("Importing keys for account %s into wallet %s." % (self.defproduceraAccount.name, wallet.name))
-        if not self.walletMgr.importKey(self.defproduceraAccount, wallet):
-            Utils.Print("ERROR: Failed to import key for account %s" % (self.defproduceraAccount.name))
-            return False
-
-        Utils.Print("Importing keys for account %s into wallet %s." % (self.defproducerbAccount.name, wallet.name))
-        if not self.walletMgr.importKey(self.defproducerbAccount, wallet):
-            Utils.Print("ERROR: Failed to import key for account %s" % (self.defproducerbAccount.name))
-            return False
-
-        for account in accounts:
-            Utils.Print("Importing keys for account %s into wallet %s." % (account.name, wallet.name))
-            if not self.walletMgr.importKey(account, wallet):
-                Utils.Print("ERROR: Failed to import key for account %s" % (account.name))
+        importAccounts=[self.defproduceraAccount, self.defproducerbAccount] + (accounts if accounts else [])
+        Utils.Print("Importing keys for %d accounts into wallet %s." % (len(importAccounts), wallet.name))
+        results=self.walletMgr.importKeys(importAccounts, wallet)
+        existing=0
+        for account, key, status, msg in results:
+            if status == WalletMgr.KeyFailed:
+                Utils.Print("ERROR: Failed to import key %s for account %s. %s" % (key, account.name, msg))
                 return False
+            if status == WalletMgr.KeyExists:
+                existing += 1
+        if existing > 0:
+            Utils.Print("WARNING: %d of %d keys were already imported into the wallet." % (existing, len(results)))
 
         self.accounts=accounts
         return True
@@ -1616,15 +3336,44 @@ class Cluster(object):
     def getNodes(self):
         return self.nodes
 
-    # Spread funds across accounts with transactions spread through cluster nodes.
-    #  Validate transactions are synchronized on root node
-    def spreadFunds(self, source, accounts, amount=1):
+    def setBlockArchives(self, path):
+        """Archive the blocks fetched from each cluster node under path/node_<index> (see Node.setBlockArchive).
+        Returns list of the BlockArchive objects."""
+        archives=[]
+        for i,node in enumerate(self.nodes):
+            archive=BlockArchive(os.path.join(path, "node_%02d" % (i)))
+            node.setBlockArchive(archive)
+            archives.append(archive)
+        return archives
+
+    def getBalanceSnapshots(self, names, nodes=None, contract="io.token", symbol=CORE_SYMBOL):
+        """Returns list of balance snapshots (see Node.getBalanceSnapshot), one per live node of nodes (defaults to the
+        cluster nodes), queried from all nodes at once."""
+        if nodes is None:
+            nodes=self.nodes
+        liveNodes=[node for node in nodes if not node.killed]
+        if Utils.UseHttp:
+            return Utils.runAsyncAll([node.asyncNode().getBalanceSnapshot(names, contract, symbol) for node in liveNodes])
+        if len(liveNodes) == 0:
+            return []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(liveNodes)) as executor:
+            return list(executor.map(lambda node: node.getBalanceSnapshot(names, contract, symbol), liveNodes))
+
+    def entryNodeSelector(self, policy=NodeSelector.RoundRobin, weights=None):
+        """Returns NodeSelector over the cluster nodes (killed ones are skipped when selecting)."""
+        return NodeSelector(self.nodes, policy, weights)
+
+    # Spread funds across accounts with transactions spread through cluster nodes (entry nodes picked by selector,
+    #  round robin by default). Validate transactions are synchronized on root node
+    def spreadFunds(self, source, accounts, amount=1, selector=None):
         assert(source)
         assert(isinstance(source, Account))
         assert(accounts)
         assert(isinstance(accounts, list))
         assert(len(accounts) > 0)
         Utils.Print("len(accounts): %d" % (len(accounts)))
+        if selector is None:
+            selector=self.entryNodeSelector()
 
         count=len(accounts)
         transferAmount=(count*amount)+amount
@@ -1642,27 +3391,18 @@ class Cluster(object):
 
         if Utils.Debug: Utils.Print("Funds transfered on transaction id %s." % (transId))
 
-        nextIdx=-1
         for i in range(0, count):
             account=accounts[i]
-            nextInstanceFound=False
-            for _ in range(0, count):
-                #Utils.Print("nextIdx: %d, n: %d" % (nextIdx, n))
-                nextIdx=(nextIdx + 1)%count
-                if not self.nodes[nextIdx].killed:
-                    #Utils.Print("nextIdx: %d" % (nextIdx))
-                    nextInstanceFound=True
-                    break
-
-            if nextInstanceFound is False:
+            try:
+                node=selector.select()
+            except RuntimeError as _:
                 Utils.Print("ERROR: No active nodes found.")
                 return False
 
-            #Utils.Print("nextIdx: %d, count: %d" % (nextIdx, count))
-            node=self.nodes[nextIdx]
             if Utils.Debug: Utils.Print("Wait for trasaction id %s on node port %d" % (transId, node.port))
             if node.waitForTransIdOnNode(transId) is False:
                 Utils.Print("ERROR: Selected node never received transaction id %s" % (transId))
+                selector.record(node, False, 0)
                 return False
 
             transferAmount -= amount
@@ -1672,8 +3412,10 @@ class Cluster(object):
             Utils.Print("Transfer %s units from account %s to %s on  server port %d." %
                     (transferAmountStr, fromm.name, to.name, node.port))
 
+            start=time.time()
             trans=node.transferFunds(fromm, to, transferAmountStr)
             transId=Node.getTransId(trans)
+            selector.record(node, transId is not None, time.time() - start)
             if transId is None:
                 return False
 
@@ -1686,6 +3428,7 @@ class Cluster(object):
             Utils.Print("ERROR: Selected node never received transaction id %s" % (transId))
             return False
 
+        if Utils.Debug: Utils.Print(selector.report())
         return True
 
     def validateSpreadFunds(self, initialBalances, transferAmount, source, accounts):
@@ -1700,14 +3443,18 @@ class Cluster(object):
         assert(isinstance(initialBalances, dict))
         assert(isinstance(transferAmount, int))
 
-        for node in self.nodes:
-            if node.killed:
-                continue
+        liveNodes=[node for node in self.nodes if not node.killed]
+        allBalances=[None]*len(liveNodes)
+        if not self.enableMongo:
+            # fetch every node's balances at once, validation below is then pure computation
+            snapshots=self.getBalanceSnapshots([account.name for account in [source] + accounts], liveNodes)
+            allBalances=[{account: snapshot[account.name] for account in [source] + accounts} for snapshot in snapshots]
 
+        for node,balances in zip(liveNodes, allBalances):
             if Utils.Debug: Utils.Print("Validate funds on %s server port %d." %
                                         (Utils.ServerName, node.port))
 
-            if node.validateFunds(initialBalances, transferAmount, source, accounts) is False:
+            if node.validateFunds(initialBalances, transferAmount, source, accounts, balances) is False:
                 Utils.Print("ERROR: Failed to validate funds on  node port: %d" % (node.port))
                 return False
 
@@ -1846,6 +3593,13 @@ class Cluster(object):
         Ensure nodes are inter-connected prior to this call. One way to validate this will be to check if every node has block 1."""
 
         Utils.Print("Starting cluster bootstrap.")
+        Cluster.bootstrapTimings=[]
+        phaseStart=[time.time()]
+        def phaseDone(phase):
+            now=time.time()
+            Cluster.bootstrapTimings.append((phase, now-phaseStart[0]))
+            phaseStart[0]=now
+
         biosNode=Node(biosHost, biosPort)
         if not biosNode.checkPulse():
             Utils.Print("ERROR: Bios node doesn't appear to be running...")
@@ -1883,6 +3637,7 @@ class Cluster(object):
             if not walletMgr.importKey(ioAccount, ignWallet):
                 Utils.Print("ERROR: Failed to import %s account keys into ignition wallet." % (ioName))
                 return False
+            phaseDone("ignition wallet")
 
             contract="io.bios"
             contractDir="contracts/%s" % (contract)
@@ -1895,6 +3650,7 @@ class Cluster(object):
                 return False
 
             Node.validateTransaction(trans)
+            phaseDone("publish io.bios")
 
             Utils.Print("Creating accounts: %s " % ", ".join(producerKeys.keys()))
             producerKeys.pop(ioName)
@@ -1918,6 +3674,7 @@ class Cluster(object):
 
             Utils.Print("Validating system accounts within bootstrap")
             biosNode.validateAccounts(accounts)
+            phaseDone("create producer accounts")
 
             if not onlyBios:
                 if prodCount == -1:
@@ -1970,6 +3727,7 @@ class Cluster(object):
                 if not ret:
                     Utils.Print("ERROR: Block production handover failed.")
                     return False
+                phaseDone("set producers")
 
             ioTokenAccount=copy.deepcopy(ioAccount)
             ioTokenAccount.name="io.token"
@@ -2002,6 +3760,7 @@ class Cluster(object):
             Node.validateTransaction(trans)
             transId=Node.getTransId(trans)
             biosNode.waitForTransIdOnNode(transId)
+            phaseDone("create system accounts")
 
             contract="io.token"
             contractDir="contracts/%s" % (contract)
@@ -2012,6 +3771,7 @@ class Cluster(object):
             if trans is None:
                 Utils.Print("ERROR: Failed to publish contract %s." % (contract))
                 return False
+            phaseDone("publish io.token")
 
             # Create currency0000, followed by issue currency0000
             contract=ioTokenAccount.name
@@ -2050,6 +3810,7 @@ class Cluster(object):
                 Utils.Print("ERROR: Issue verification failed. Excepted %s, actual: %s" %
                             (expectedAmount, actualAmount))
                 return False
+            phaseDone("create and issue currency")
 
             contract="io.system"
             contractDir="contracts/%s" % (contract)
@@ -2062,26 +3823,41 @@ class Cluster(object):
                 return False
 
             Node.validateTransaction(trans)
+            phaseDone("publish io.system")
 
             initialFunds="1000000.0000 {0}".format(CORE_SYMBOL)
             Utils.Print("Transfer initial fund %s to individual accounts." % (initialFunds))
             trans=None
             contract=ioTokenAccount.name
             action="transfer"
-            for name, keys in producerKeys.items():
-                data="{\"from\":\"%s\",\"to\":\"%s\",\"quantity\":\"%s\",\"memo\":\"%s\"}" % (ioAccount.name, name, initialFunds, "init transfer")
-                opts="--permission %s@active" % (ioAccount.name)
-                trans=biosNode.pushMessage(contract, action, data, opts)
-                if trans is None or not trans[0]:
-                    Utils.Print("ERROR: Failed to transfer funds from %s to %s." % (ioTokenAccount.name, name))
-                    return False
+            if biosNode.rpcPushEnabled():
+                batch=[]
+                for name in producerKeys.keys():
+                    data={"from": ioAccount.name, "to": name, "quantity": initialFunds, "memo": "init transfer"}
+                    auth=[{"actor": ioAccount.name, "permission": "active"}]
+                    batch.append([{"account": contract, "name": action, "authorization": auth, "data": data}])
+                for name,trans in zip(producerKeys.keys(), biosNode.pushTransactions(batch)):
+                    if not trans[0]:
+                        Utils.Print("ERROR: Failed to transfer funds from %s to %s. %s" % (ioTokenAccount.name, name, trans[1]))
+                        return False
+
+                    Node.validateTransaction(trans[1])
+            else:
+                for name, keys in producerKeys.items():
+                    data="{\"from\":\"%s\",\"to\":\"%s\",\"quantity\":\"%s\",\"memo\":\"%s\"}" % (ioAccount.name, name, initialFunds, "init transfer")
+                    opts="--permission %s@active" % (ioAccount.name)
+                    trans=biosNode.pushMessage(contract, action, data, opts)
+                    if trans is None or not trans[0]:
+                        Utils.Print("ERROR: Failed to transfer funds from %s to %s." % (ioTokenAccount.name, name))
+                        return False
 
-                Node.validateTransaction(trans[1])
+                    Node.validateTransaction(trans[1])
 
             Utils.Print("Wait for last transfer transaction to become finalized.")
             transId=Node.getTransId(trans[1])
             if not biosNode.waitForTransIdOnNode(transId):
                 return False
+            phaseDone("initial transfers")
 
             Utils.Print("Cluster bootstrap done.")
         finally:
@@ -2092,10 +3868,76 @@ class Cluster(object):
         return True
 
 
+    @staticmethod
+    def scanProcNodes():
+        """Single pass over /proc matching nod command lines. Returns dictionary (Keys: node id parsed from
+        "--data-dir var/lib/node_NN"; Values: (pid, command line up to the data dir)). None if /proc is unavailable."""
+        if not os.path.isdir("/proc"):
+            return None
+
+        pattern=re.compile(r"^(.* --data-dir var/lib/node_(\d+))")
+        found={}
+        for pidStr in os.listdir("/proc"):
+            if not pidStr.isdigit():
+                continue
+            try:
+                with open("/proc/%s/cmdline" % (pidStr), "rb") as f:
+                    cmdline=f.read()
+            except OSError as _:
+                continue # process exited or is not ours
+            args=cmdline.rstrip(b"\0").split(b"\0")
+            if not args[0] or os.path.basename(args[0].decode("utf-8", "replace")) != Utils.ServerName:
+                continue
+            m=pattern.match(b" ".join(args).decode("utf-8", "replace"))
+            if m is not None:
+                found[int(m.group(2))]=(int(pidStr), m.group(1))
+        return found
+
+    @staticmethod
+    def waitOnNodesReady(nodes, timeout=None, pollInterval=0.25):
+        """Probe every node's HTTP endpoint concurrently until it answers get info. Returns list of nodes that did not
+        become ready within timeout."""
+        if timeout is None:
+            timeout=Utils.systemWaitTimeout
+        endTime=time.time()+Utils.effectiveTimeout(timeout)
+
+        async def probe(node):
+            while True:
+                info=await node.asyncNode().getInfo(silentErrors=True)
+                if info is not None:
+                    return True
+                if time.time() >= endTime:
+                    return False
+                await asyncio.sleep(pollInterval)
+
+        ready=Utils.runAsyncAll([probe(node) for node in nodes])
+        return [node for node,ok in zip(nodes, ready) if not ok]
+
     # Populates list of InstanceInfo objects, matched to actual running instances
     def discoverLocalNodes(self, totalNodes, timeout=0):
         nodes=[]
 
+        if os.path.isdir("/proc"):
+            def scan():
+                found=Cluster.scanProcNodes()
+                return found if all(i in found for i in range(totalNodes)) else None
+
+            found=Utils.waitForObj(scan, timeout, sleepTime=0.25)
+            if found is None:
+                found=Cluster.scanProcNodes()
+            if Utils.Debug: Utils.Print("/proc scan: %s" % (found))
+            for i in range(0, totalNodes):
+                if i not in found:
+                    Utils.Print("ERROR: Failed to find %s pid for var/lib/node_%02d" % (Utils.ServerName, i))
+                    break
+                pid,cmd=found[i]
+                instance=Node(self.host, self.port + i, pid=pid, cmd=cmd, enableMongo=self.enableMongo, mongoHost=self.mongoHost, mongoPort=self.mongoPort, mongoDb=self.mongoDb)
+                instance.setWalletEndpointArgs(self.walletEndpointArgs)
+                if Utils.Debug: Utils.Print("Node>", instance)
+                nodes.append(instance)
+
+            return nodes
+
         pgrepOpts="-fl"
         # pylint: disable=deprecated-method
         if platform.linux_distribution()[0] in ["Ubuntu", "LinuxMint", "Fedora","CentOS Linux","arch"]:
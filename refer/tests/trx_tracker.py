@@ -0,0 +1,174 @@
+import threading
+import time
+
+from latency_histogram import LatencyHistogram
+
+# Inclusion and irreversibility latency of submitted transactions. A TransactionTracker listens to one node's
+# BlockFollower, records when each followed block was first seen and when it became irreversible, and matches block
+# transaction ids against the tracked set, so thousands of in-flight transactions cost no per-id polling.
+# Observation times are local wall clock times, so their resolution is the follower poll interval.
+
+class TrackedTransaction(object):
+    def __init__(self, transId, submitTime, acceptTime):
+        self.transId=transId
+        self.submitTime=submitTime      # sent to the API
+        self.acceptTime=acceptTime      # API answered
+        self.blockNum=None
+        self.includeTime=None           # containing block first seen
+        self.irreversibleTime=None      # containing block first seen irreversible
+
+    def toDict(self):
+        return {"id": self.transId, "submit": self.submitTime, "accept": self.acceptTime, "block_num": self.blockNum,
+                "include": self.includeTime, "irreversible": self.irreversibleTime}
+
+
+class TransactionTracker(object):
+    """Track transactions submitted through node until they are in a block and irreversible on it. Without keepRecords
+    irreversible transactions are dropped once their latencies are recorded, so long runs hold in-flight ones only."""
+
+    def __init__(self, node, follower=None, keepRecords=True):
+        self.node=node
+        self.follower=follower if follower is not None else node.blockFollower()
+        self.keepRecords=keepRecords
+        self.tracked=0
+        self.transactions={}            # transaction id -> TrackedTransaction
+        self.acceptLatency=LatencyHistogram()
+        self.includeLatency=LatencyHistogram()
+        self.irreversibleLatency=LatencyHistogram()
+        self.finalityLatency=LatencyHistogram() # included -> irreversible
+        self.__blockSeen={}             # block number -> time first seen
+        self.__blockIds={}              # block number -> id of the block seen at that height
+        self.__blockIrreversible={}     # block number -> time first seen irreversible
+        self.__lastIrreversibleBlockNum=None
+        self.__pendingInclusion=set()   # transaction ids
+        self.__pendingIrreversible={}   # block number -> tracked transactions included in it
+        self.__lock=threading.Lock()
+        self.__started=False
+
+    def start(self):
+        """Begin following the node from its current head. Call before submitting what should be tracked."""
+        if self.__started:
+            return
+        headBlockNum=self.node.getHeadBlockNum()
+        assert(headBlockNum is not None)
+        self.follower.start(headBlockNum)
+        self.follower.addListener(self)
+        self.follower.run()
+        self.__started=True
+
+    def stop(self):
+        if self.__started:
+            self.follower.removeListener(self)
+            self.__started=False
+
+    def __prune(self):
+        # keep block observations for the follower's window only
+        low=self.follower.lowBlockNum
+        if low is None or len(self.__blockSeen) <= self.follower.maxBlocks:
+            return
+        for blockNum in [num for num in self.__blockSeen if num < low]:
+            self.__blockSeen.pop(blockNum, None)
+            self.__blockIds.pop(blockNum, None)
+            self.__blockIrreversible.pop(blockNum, None)
+
+    def __included(self, trx, blockNum, includeTime):
+        trx.blockNum=blockNum
+        trx.includeTime=includeTime
+        self.includeLatency.recordSeconds(includeTime - trx.submitTime)
+        irreversibleTime=self.__blockIrreversible.get(blockNum)
+        if irreversibleTime is not None:
+            self.__irreversible(trx, irreversibleTime)
+        else:
+            self.__pendingIrreversible.setdefault(blockNum, []).append(trx)
+
+    def __irreversible(self, trx, irreversibleTime):
+        trx.irreversibleTime=irreversibleTime
+        self.irreversibleLatency.recordSeconds(irreversibleTime - trx.submitTime)
+        self.finalityLatency.recordSeconds(irreversibleTime - trx.includeTime)
+        if not self.keepRecords:
+            del self.transactions[trx.transId]
+
+    def __replaced(self, blockNum):
+        # a fork switch replaced the block at blockNum: its transactions are back to waiting for inclusion
+        self.__blockSeen.pop(blockNum, None)
+        for trx in self.__pendingIrreversible.pop(blockNum, []):
+            self.includeLatency.record((trx.includeTime - trx.submitTime)*1000000, -1)
+            trx.blockNum=None
+            trx.includeTime=None
+            self.__pendingInclusion.add(trx.transId)
+
+    def onBlock(self, blockNum, blockId, transIds):
+        now=time.time()
+        with self.__lock:
+            if self.__blockIds.get(blockNum, blockId) != blockId:
+                self.__replaced(blockNum)
+            self.__blockIds[blockNum]=blockId
+            self.__blockSeen.setdefault(blockNum, now)
+            for transId in transIds:
+                if transId in self.__pendingInclusion:
+                    self.__pendingInclusion.remove(transId)
+                    self.__included(self.transactions[transId], blockNum, now)
+            self.__prune()
+
+    def onInfo(self, info):
+        now=time.time()
+        libBlockNum=int(info["last_irreversible_block_num"])
+        with self.__lock:
+            if self.__lastIrreversibleBlockNum is None:
+                self.__lastIrreversibleBlockNum=min(libBlockNum, self.follower.lowBlockNum - 1)
+            for blockNum in range(self.__lastIrreversibleBlockNum + 1, libBlockNum + 1):
+                self.__blockIrreversible.setdefault(blockNum, now)
+                for trx in self.__pendingIrreversible.pop(blockNum, []):
+                    self.__irreversible(trx, now)
+            self.__lastIrreversibleBlockNum=max(self.__lastIrreversibleBlockNum, libBlockNum)
+
+    def track(self, transId, submitTime, acceptTime=None):
+        """Track transId, sent at submitTime and accepted by the API at acceptTime (now if None). Transactions already
+        seen in a followed block are resolved from the recorded block observation times."""
+        if acceptTime is None:
+            acceptTime=time.time()
+        trx=TrackedTransaction(transId, submitTime, acceptTime)
+        with self.__lock:
+            if transId in self.transactions:
+                return
+            # looked up under the lock: the follower indexes a block before calling onBlock, which waits for the lock
+            blockNum=self.follower.find(transId)
+            self.transactions[transId]=trx
+            self.tracked += 1
+            self.acceptLatency.recordSeconds(acceptTime - submitTime)
+            if blockNum is not None and blockNum in self.__blockSeen:
+                self.__included(trx, blockNum, self.__blockSeen[blockNum])
+            else:
+                self.__pendingInclusion.add(transId)
+
+    def pendingInclusion(self):
+        with self.__lock:
+            return len(self.__pendingInclusion)
+
+    def pendingIrreversible(self):
+        with self.__lock:
+            return len(self.__pendingInclusion) + sum(len(trxs) for trxs in self.__pendingIrreversible.values())
+
+    def waitForInclusion(self, timeout=None):
+        """Wait until every tracked transaction is in a block. Returns True on success, False on timeout."""
+        return self.follower.waitFor(lambda _: self.pendingInclusion() == 0, timeout) is not None
+
+    def waitForIrreversible(self, timeout=None):
+        """Wait until every tracked transaction is irreversible. Returns True on success, False on timeout."""
+        return self.follower.waitFor(lambda _: self.pendingIrreversible() == 0, timeout) is not None
+
+    def records(self):
+        """Returns list of per transaction dictionaries (times are None where not reached), in submit order. Without
+        keepRecords only transactions not yet irreversible are listed."""
+        with self.__lock:
+            trxs=sorted(self.transactions.values(), key=lambda trx: trx.submitTime)
+            return [trx.toDict() for trx in trxs]
+
+    def report(self):
+        lines=["%d transaction(s) tracked on %s, %d not in a block, %d not irreversible" % (
+            self.tracked, self.node, self.pendingInclusion(), self.pendingIrreversible())]
+        lines.append("accepted:     %s" % (self.acceptLatency.summary()))
+        lines.append("included:     %s" % (self.includeLatency.summary()))
+        lines.append("irreversible: %s" % (self.irreversibleLatency.summary()))
+        lines.append("finality:     %s" % (self.finalityLatency.summary()))
+        return "\n".join(lines)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+import testUtils
+from loadgen import LoadGenerator, ArrivalSchedule, ResultSink
+
+import argparse
+import gzip
+import json
+import threading
+import time
+
+from core_symbol import CORE_SYMBOL
+
+###############################################################
+# tx_corpus
+#
+# Pre-signed transaction corpus. The generate stage packs and signs transactions once (through the wallet) and
+# stores them one packed transaction per line, after a header line, optionally gzipped (.gz suffix). The replay stage
+# streams the corpus at a target rate against one or more nodes, so signing cost stays out of the measured window.
+#
+# Transactions reference the head block at generation time and expire after --expiration seconds (nod caps it at
+# one hour), so a corpus has to be replayed within that window on the chain it was generated on.
+#
+###############################################################
+
+Print=testUtils.Utils.Print
+
+class TxCorpus(object):
+    Format="tx_corpus"
+    Version=1
+    MaxExpiration=3600
+
+    @staticmethod
+    def transferActions(accounts, count, amountStr="0.0001 %s" % (CORE_SYMBOL), memoPrefix="corpus"):
+        """Generate count single transfer action lists, each account sending to the next one round robin. Memos are
+        numbered so every transaction is unique."""
+        assert(len(accounts) > 1)
+        for i in range(count):
+            source=accounts[i % len(accounts)]
+            destination=accounts[(i+1) % len(accounts)]
+            yield [{"account": "io.token", "name": "transfer",
+                    "authorization": [{"actor": source.name, "permission": "active"}],
+                    "data": {"from": source.name, "to": destination.name, "quantity": amountStr,
+                             "memo": "%s %d" % (memoPrefix, i)}}]
+
+    @staticmethod
+    def sign(node, actionsList, expiration=MaxExpiration, chunkSize=1000):
+        """Sign transactions (each a list of actions, see Node.pushTransaction) through node's wallet in chunks.
+        Yields packed transaction json objects in order. Raises RuntimeError on the first signing failure."""
+        assert(expiration <= TxCorpus.MaxExpiration)
+        chunk=[]
+        def signChunk():
+            for ok,packed in node.signTransactions(chunk, expiration):
+                if not ok:
+                    raise RuntimeError("Failed to sign corpus transaction: %s" % (packed))
+                yield packed
+
+        for actions in actionsList:
+            chunk.append(actions)
+            if len(chunk) >= chunkSize:
+                yield from signChunk()
+                chunk=[]
+        if len(chunk) > 0:
+            yield from signChunk()
+
+    @staticmethod
+    def open(path, mode):
+        if path.endswith(".gz"):
+            return gzip.open(path, mode + "t", encoding="utf-8")
+        return open(path, mode, encoding="utf-8")
+
+    @staticmethod
+    def write(path, node, packedTrxs, expiration=MaxExpiration):
+        """Write header and packed transactions to path. Returns number of transactions written."""
+        info=node.getInfo()
+        header={"format": TxCorpus.Format, "version": TxCorpus.Version, "chain_id": info["chain_id"],
+                "created": time.time(), "expiration": expiration}
+        count=0
+        with TxCorpus.open(path, "w") as f:
+            f.write(json.dumps(header, separators=(",", ":")) + "\n")
+            for packed in packedTrxs:
+                f.write(json.dumps(packed, separators=(",", ":")) + "\n")
+                count += 1
+        return count
+
+    @staticmethod
+    def read(path):
+        """Returns (header, generator of packed transaction json objects)."""
+        f=TxCorpus.open(path, "r")
+        header=json.loads(f.readline())
+        if header.get("format") != TxCorpus.Format or header.get("version") != TxCorpus.Version:
+            f.close()
+            raise ValueError("%s is not a version %d transaction corpus" % (path, TxCorpus.Version))
+
+        def trxs():
+            with f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        return (header, trxs())
+
+    @staticmethod
+    def remaining(header):
+        """Seconds until the corpus transactions expire."""
+        return header["created"] + header["expiration"] - time.time()
+
+    @staticmethod
+    def submitter(packedTrxs, nodes):
+        """Returns a LoadGenerator submit function that pushes the next packed transaction to nodes round robin and
+        returns the push transaction json object (None on failure, LoadGenerator.Stop once the corpus is exhausted)."""
+        assert(len(nodes) > 0)
+        lock=threading.Lock()
+        trxs=iter(packedTrxs)
+
+        def submit(seq):
+            with lock:
+                packed=next(trxs, None)
+            if packed is None:
+                return LoadGenerator.Stop
+            node=nodes[seq % len(nodes)]
+            try:
+                return node.rpcCall("/v1/chain/push_transaction", packed)
+            except testUtils.RpcError as ex:
+                if testUtils.Utils.Debug: Print("push transaction failed on %s: %s" % (node, ex))
+                return None
+        return submit
+
+    @staticmethod
+    def replay(packedTrxs, nodes, rate, workers=16, arrival=ArrivalSchedule.Constant, count=None, duration=None,
+               resultsFile=None):
+        """Push packed transactions at rate per second, spreading them round robin over nodes. Stops when the corpus
+        is exhausted, count transactions were offered or duration passed. Returns loadgen LoadResult, whose cancelled
+        counts the arrivals left over once the corpus ran out. Push transaction responses are streamed to resultsFile
+        (see loadgen.ResultSink) if set and otherwise only counted, so memory does not grow with the corpus."""
+        if count is None and duration is None and isinstance(packedTrxs, list):
+            count=len(packedTrxs)
+        sink=ResultSink(resultsFile) if resultsFile is not None else None
+        generator=LoadGenerator(TxCorpus.submitter(packedTrxs, nodes), rate, workers=workers, arrival=arrival,
+                                sink=sink, keepResults=False)
+        try:
+            return generator.run(duration=duration, count=count)
+        finally:
+            if sink is not None:
+                sink.close()
+
+
+def parseNode(hostPort):
+    host,_,port=hostPort.rpartition(":")
+    return testUtils.Node(host if host else "localhost", int(port))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate or replay a pre-signed transaction corpus")
+    parser.add_argument("-v", help="verbose", action='store_true')
+    subparsers=parser.add_subparsers(dest="command")
+
+    generateParser=subparsers.add_parser("generate", help="sign transfers between existing accounts into a corpus")
+    generateParser.add_argument("--node", help="node host:port used for signing", default="localhost:8888")
+    generateParser.add_argument("--wallet-url", help="kd url, e.g. http://localhost:8899 (default: node's wallet)")
+    generateParser.add_argument("--accounts", help="comma separated accounts whose active keys are in the wallet",
+                                required=True)
+    generateParser.add_argument("--count", type=int, help="number of transactions", required=True)
+    generateParser.add_argument("--amount", help="transfer amount", default="0.0001 %s" % (CORE_SYMBOL))
+    generateParser.add_argument("--expiration", type=int, help="transaction expiration in seconds",
+                                default=TxCorpus.MaxExpiration)
+    generateParser.add_argument("--out", help="corpus file (.gz to compress)", required=True)
+
+    replayParser=subparsers.add_parser("replay", help="push a corpus at a target rate")
+    replayParser.add_argument("--corpus", help="corpus file", required=True)
+    replayParser.add_argument("--nodes", help="comma separated node host:port list", default="localhost:8888")
+    replayParser.add_argument("--rate", type=float, help="transactions per second", required=True)
+    replayParser.add_argument("--workers", type=int, help="concurrent submitters", default=16)
+    replayParser.add_argument("--arrival", choices=[ArrivalSchedule.Constant, ArrivalSchedule.Poisson],
+                              default=ArrivalSchedule.Constant)
+    replayParser.add_argument("--duration", type=float, help="stop after this many seconds")
+    replayParser.add_argument("--results", help="append push transaction responses to this file as json lines")
+
+    args = parser.parse_args()
+    testUtils.Utils.Debug=args.v
+
+    if args.command == "generate":
+        node=parseNode(args.node)
+        if args.wallet_url is not None:
+            node.setWalletEndpointArgs("--wallet-url %s" % (args.wallet_url))
+        accounts=[testUtils.Account(name) for name in args.accounts.split(",")]
+        start=time.time()
+        signed=TxCorpus.sign(node, TxCorpus.transferActions(accounts, args.count, args.amount), args.expiration)
+        written=TxCorpus.write(args.out, node, signed, args.expiration)
+        Print("Wrote %d transactions to %s in %.3f s" % (written, args.out, time.time()-start))
+    elif args.command == "replay":
+        header,trxs=TxCorpus.read(args.corpus)
+        remaining=TxCorpus.remaining(header)
+        if remaining <= 0:
+            Print("ERROR: corpus %s expired %d seconds ago" % (args.corpus, -remaining))
+            exit(1)
+        nodes=[parseNode(hostPort) for hostPort in args.nodes.split(",")]
+        chainId=nodes[0].getInfo()["chain_id"]
+        if chainId != header["chain_id"]:
+            Print("ERROR: corpus was generated for chain %s, node is on chain %s" % (header["chain_id"], chainId))
+            exit(1)
+        duration=min(remaining, args.duration) if args.duration is not None else remaining
+        result=TxCorpus.replay(trxs, nodes, args.rate, args.workers, args.arrival, duration=duration,
+                               resultsFile=args.results)
+        Print(result.report())
+    else:
+        parser.print_help()
+        exit(1)
+
+    exit(0)
@@ -0,0 +1,157 @@
+import bisect
+import random
+from collections import namedtuple
+
+from testUtils import Node
+from core_symbol import CORE_SYMBOL
+
+# Transfer workload shapes over a fixed account set. Every shape is fully determined by its seed, so a run can be
+# reproduced and its expected balances computed up front. Spreading transfers over many accounts keeps the load off a
+# single io.token accounts row, which would otherwise serialize every transfer.
+
+# sender and receiver are Account objects, amount is in currency units (10000 per SYS)
+Transfer=namedtuple("Transfer", "seq sender receiver amount")
+
+class Workload(object):
+    """Base class, subclasses implement pair(seq) returning (sender index, receiver index) into accounts."""
+
+    def __init__(self, accounts, seed=0, amount=1):
+        assert(len(accounts) > 1)
+        self.accounts=accounts
+        self.seed=seed
+        self.amount=amount
+        self.random=random.Random(seed)
+
+    def pair(self, seq):
+        raise NotImplementedError()
+
+    def transfers(self, count):
+        """Returns the first count transfers of the workload. Calling it again restarts the sequence."""
+        self.random=random.Random(self.seed)
+        self.reset()
+        transfers=[]
+        for seq in range(count):
+            sender,receiver=self.pair(seq)
+            assert(sender != receiver)
+            transfers.append(Transfer(seq, self.accounts[sender], self.accounts[receiver], self.amount))
+        return transfers
+
+    def reset(self):
+        """Rebuild any seeded state, called before generating transfers."""
+        pass
+
+    @staticmethod
+    def ledger(transfers):
+        """Returns dictionary of account name to net balance change after transfers."""
+        deltas={}
+        for transfer in transfers:
+            deltas[transfer.sender.name]=deltas.get(transfer.sender.name, 0) - transfer.amount
+            deltas[transfer.receiver.name]=deltas.get(transfer.receiver.name, 0) + transfer.amount
+        return deltas
+
+    @staticmethod
+    def outgoing(transfers):
+        """Returns dictionary of account name to total amount sent, i.e. the funding that guarantees no transfer
+        fails for lack of balance whatever order they execute in."""
+        totals={}
+        for transfer in transfers:
+            totals[transfer.sender.name]=totals.get(transfer.sender.name, 0) + transfer.amount
+        return totals
+
+    @staticmethod
+    def expectedBalances(initialBalances, transfers):
+        """Returns dictionary of account name to balance expected once transfers executed, given initialBalances
+        (account name to balance)."""
+        balances=dict(initialBalances)
+        for name,delta in Workload.ledger(transfers).items():
+            balances[name]=balances.get(name, 0) + delta
+        return balances
+
+    @staticmethod
+    def action(transfer, memoPrefix=""):
+        """Returns the io.token transfer action (see Node.pushTransaction) of transfer. Memos carry the sequence number
+        so otherwise identical transfers stay distinct transactions."""
+        return {"account": "io.token", "name": "transfer",
+                "authorization": [{"actor": transfer.sender.name, "permission": "active"}],
+                "data": {"from": transfer.sender.name, "to": transfer.receiver.name,
+                         "quantity": Node.currencyIntToStr(transfer.amount, CORE_SYMBOL),
+                         "memo": "%s%d" % (memoPrefix, transfer.seq)}}
+
+
+class FanInWorkload(Workload):
+    """Every account but the last sends to the last one (the single hot row shape, kept as a baseline)."""
+
+    def pair(self, seq):
+        return (seq % (len(self.accounts) - 1), len(self.accounts) - 1)
+
+
+class PairedWorkload(Workload):
+    """M senders to M receivers: the first half of accounts send, the second half receive. Sender i sends to receivers
+    i, i+1, ... on successive rounds, so every sender/receiver pair is used evenly."""
+
+    def __init__(self, accounts, seed=0, amount=1):
+        assert(len(accounts) >= 2 and len(accounts) % 2 == 0)
+        super().__init__(accounts, seed, amount)
+        self.m=len(accounts) // 2
+
+    def pair(self, seq):
+        sender=seq % self.m
+        receiver=(sender + seq // self.m) % self.m
+        return (sender, self.m + receiver)
+
+
+class ZipfWorkload(Workload):
+    """Senders and receivers drawn independently with Zipf popularity (weight 1/rank^exponent). Ranks are assigned to
+    accounts by a seeded shuffle."""
+
+    def __init__(self, accounts, seed=0, amount=1, exponent=1.0):
+        super().__init__(accounts, seed, amount)
+        self.exponent=exponent
+        self.ranked=None
+        self.cumulative=[]
+        total=0.0
+        for rank in range(1, len(accounts)+1):
+            total += 1.0 / rank**exponent
+            self.cumulative.append(total)
+
+    def reset(self):
+        self.ranked=list(range(len(self.accounts)))
+        self.random.shuffle(self.ranked)
+
+    def __draw(self):
+        idx=bisect.bisect_left(self.cumulative, self.random.random() * self.cumulative[-1])
+        return self.ranked[min(idx, len(self.ranked)-1)]
+
+    def pair(self, seq):
+        sender=self.__draw()
+        receiver=self.__draw()
+        while receiver == sender:
+            receiver=self.__draw()
+        return (sender, receiver)
+
+
+class RandomGraphWorkload(Workload):
+    """Random directed graph where every account has degree distinct payees. Each transfer picks a uniform sender and
+    one of its payees."""
+
+    def __init__(self, accounts, seed=0, amount=1, degree=4):
+        super().__init__(accounts, seed, amount)
+        self.degree=min(degree, len(accounts)-1)
+        self.edges=None
+
+    def reset(self):
+        count=len(self.accounts)
+        self.edges=[self.random.sample([j for j in range(count) if j != i], self.degree) for i in range(count)]
+
+    def pair(self, seq):
+        sender=self.random.randrange(len(self.accounts))
+        return (sender, self.random.choice(self.edges[sender]))
+
+
+Workloads={"fanin": FanInWorkload, "paired": PairedWorkload, "zipf": ZipfWorkload, "graph": RandomGraphWorkload}
+
+def createWorkload(name, accounts, seed=0, amount=1):
+    """Returns the workload called name (one of Workloads)."""
+    if name not in Workloads:
+        raise ValueError("Unknown workload %s, expected one of %s" % (name, ", ".join(sorted(Workloads))))
+    return Workloads[name](accounts, seed, amount)